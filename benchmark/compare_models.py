@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.log_setup import setup_logging
+from tool.utils import process_video, prediction_to_number, model_roi_size, MODEL_PATH, CONF_THRESHOLD, NMS_THRESHOLD
+from tool.yolov6_utils import resize_roi
+from tool.session_pool import get_model
+from tool.digit_cascade import digits_of
+from tool.quantize import collect_calibration_crops, DEFAULT_OUTPUT
+from benchmark.run_benchmark import percentiles
+from benchmark.synthetic_video import read_crop
+
+def run_model(model, crops, batch_size=8):
+    """回傳 (每張 crop 的 bbox, 每張的平均 latency)；crop 先縮放成與 process_video 相同的大小"""
+    crops = [resize_roi(crop, model_roi_size(model)) for crop in crops]
+    predictions = []
+    latencies = []
+    for start in range(0, len(crops), batch_size):
+        batch = crops[start:start + batch_size]
+        t0 = time.perf_counter()
+        predictions.extend(model.detect_batch(batch))
+        latencies.append((time.perf_counter() - t0) / len(batch))
+    return predictions, latencies
+
+def compare_predictions(baseline, candidate):
+    digit_matches = 0
+    number_matches = 0
+    mismatches = []
+    for index, (a, b) in enumerate(zip(baseline, candidate)):
+        number_a, number_b = prediction_to_number(a), prediction_to_number(b)
+        digit_matches += digits_of(a) == digits_of(b)
+        if number_a == number_b:
+            number_matches += 1
+        elif len(mismatches) < 20:
+            mismatches.append({'crop': index, 'baseline': number_a, 'candidate': number_b})
+    total = len(baseline)
+    return {'crops': total,
+            'digit_agreement': digit_matches / total if total else 1.0,
+            'number_agreement': number_matches / total if total else 1.0,
+            'mismatches': mismatches}
+
+def compare_tables(baseline_df, candidate_df):
+    """兩個模型的 測量/數值 表逐列比對"""
+    baseline_rows = list(baseline_df.itertuples(index=False, name=None))
+    candidate_rows = list(candidate_df.itertuples(index=False, name=None))
+    differing = [{'row': i, 'baseline': list(a), 'candidate': list(b)}
+                 for i, (a, b) in enumerate(zip(baseline_rows, candidate_rows)) if a != b]
+    return {'baseline_rows': len(baseline_rows), 'candidate_rows': len(candidate_rows),
+            'differing_rows': differing,
+            'identical': len(baseline_rows) == len(candidate_rows) and not differing}
+
+def compare_models(videos, crop_xywh, baseline_path, candidate_path, samples=500, batch_size=8, analyze=True):
+    baseline = get_model(baseline_path, confThreshold=CONF_THRESHOLD, nmsThreshold=NMS_THRESHOLD)
+    candidate = get_model(candidate_path, confThreshold=CONF_THRESHOLD, nmsThreshold=NMS_THRESHOLD)
+
+    # 兩個模型使用同一批 crop
+    crops = collect_calibration_crops(videos, crop_xywh, samples)
+    baseline_predictions, baseline_latency = run_model(baseline, crops, batch_size)
+    candidate_predictions, candidate_latency = run_model(candidate, crops, batch_size)
+    baseline_stats, candidate_stats = percentiles(baseline_latency), percentiles(candidate_latency)
+    report = {
+        'baseline': baseline_path,
+        'candidate': candidate_path,
+        'agreement': compare_predictions(baseline_predictions, candidate_predictions),
+        'latency': {'baseline': baseline_stats, 'candidate': candidate_stats,
+                    'speedup': baseline_stats['mean_ms'] / candidate_stats['mean_ms'] if crops else 0.0},
+        'videos': [],
+    }
+    if analyze:
+        # 整部影片跑完整流程，比較 analyze_number_date 的輸出
+        for video in videos:
+            tables = [process_video(video, crop_xywh, model_local=model, modelpath=path)
+                      for model, path in ((baseline, baseline_path), (candidate, candidate_path))]
+            report['videos'].append({'video': video, **compare_tables(*tables)})
+    return report
+
+def print_report(report):
+    agreement = report['agreement']
+    latency = report['latency']
+    print(f"baseline     : {report['baseline']}")
+    print(f"candidate    : {report['candidate']}")
+    print(f"crops        : {agreement['crops']}  digits agree {agreement['digit_agreement']:.2%}  "
+          f"numbers agree {agreement['number_agreement']:.2%}")
+    for name in ('baseline', 'candidate'):
+        stats = latency[name]
+        if stats:
+            print(f"{name:<13}: mean={stats['mean_ms']:.3f} ms/crop  p50={stats['p50_ms']:.3f}  p90={stats['p90_ms']:.3f}")
+    print(f"speedup      : {latency['speedup']:.2f}x")
+    for mismatch in agreement['mismatches']:
+        print(f"  crop {mismatch['crop']}: {mismatch['baseline']} -> {mismatch['candidate']}")
+    for video in report['videos']:
+        print(f"{video['video']}: {video['baseline_rows']} vs {video['candidate_rows']} measurements, "
+              f"{len(video['differing_rows'])} differing rows")
+        for row in video['differing_rows']:
+            print(f"  row {row['row']}: {row['baseline']} -> {row['candidate']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a candidate model (e.g. INT8) against the FP32 model")
+    parser.add_argument('videos', nargs='+', help="videos to sample crops from and to process end to end")
+    parser.add_argument('--baseline', default=MODEL_PATH)
+    parser.add_argument('--candidate', default=DEFAULT_OUTPUT)
+    parser.add_argument('--settings', default='settings.ini')
+    parser.add_argument('--samples', type=int, default=500, help="number of crops run through both models")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--no-analyze', action='store_true', help="skip the full process_video comparison")
+    parser.add_argument('--json', help="write the report to this file")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    report = compare_models(args.videos, read_crop(args.settings), args.baseline, args.candidate,
+                            args.samples, args.batch_size, analyze=not args.no_analyze)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    identical = all(video['identical'] for video in report['videos'])
+    return 0 if identical and report['agreement']['number_agreement'] == 1.0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
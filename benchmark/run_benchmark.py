@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import numpy as np
+import pandas as pd
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool.log_setup import setup_logging
+from tool.utils import (process_video, iter_sampled_frames, prepare_frame, model_roi_size, prediction_to_number,
+                        analyze_number_date, MODEL_PATH, CONF_THRESHOLD, NMS_THRESHOLD)
+from tool.frame_sampler import FrameSampler
+from tool.sample_buffer import SampleBuffer
+from tool.timestamps import DATE_FORMAT
+from tool.session_pool import get_model
+from benchmark.synthetic_video import make_synthetic_video, read_crop
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000.0
+    return {'count': len(values), 'mean_ms': float(values.mean()), 'p50_ms': float(np.percentile(values, 50)),
+            'p90_ms': float(np.percentile(values, 90)), 'p99_ms': float(np.percentile(values, 99))}
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 單位為 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def profile_stages(video_path, crop_xywh, model, batch_size=8):
+    """依序執行各階段並分別計時 (每個取樣幀的 decode / preprocess，每批的 inference)"""
+    timings = {'decode': [], 'preprocess': [], 'infer': [], 'postprocess': [], 'analyze': []}
+    cap = cv2.VideoCapture(video_path)
+    date = os.path.basename(video_path).split("_")[3]
+    frames = iter_sampled_frames(cap, FrameSampler(cap), date)
+    data = SampleBuffer()
+    pending = []
+    roi_size = model_roi_size(model)
+
+    def flush():
+        if not pending:
+            return
+        t0 = time.perf_counter()
+        predictions = model.detect_batch([item[2] for item in pending])
+        t1 = time.perf_counter()
+        numbers = [prediction_to_number(prediction) for prediction in predictions]
+        t2 = time.perf_counter()
+        timings['infer'].append((t1 - t0) / len(pending))
+        timings['postprocess'].append((t2 - t1) / len(pending))
+        for (frame_count, timestamp, _), number in zip(pending, numbers):
+            data.append(frame_count, number, timestamp)
+        pending.clear()
+
+    while True:
+        t0 = time.perf_counter()
+        item = next(frames, None)
+        if item is None:
+            break
+        t1 = time.perf_counter()
+        frame_count, timestamp, frame = item
+        pending.append((frame_count, timestamp, prepare_frame(frame, crop_xywh, roi_size)))
+        t2 = time.perf_counter()
+        timings['decode'].append(t1 - t0)
+        timings['preprocess'].append(t2 - t1)
+        if len(pending) >= batch_size:
+            flush()
+    flush()
+    cap.release()
+
+    t0 = time.perf_counter()
+    analyze_number_date(data.to_dataframe())
+    timings['analyze'].append(time.perf_counter() - t0)
+    return {stage: percentiles(samples) for stage, samples in timings.items()}
+
+def check_ground_truth(measure_df, expected, time_tolerance_sec=2.0):
+    """比對 測量/數值 表與 ground truth，時間允許 time_tolerance_sec 的誤差"""
+    predicted = list(zip(measure_df['數值'].tolist(), measure_df['時間'].tolist())) if len(measure_df) else []
+    value_matches = 0
+    time_matches = 0
+    for (value, date), truth in zip(predicted, expected):
+        if abs(float(value) - truth['數值']) < 1e-6:
+            value_matches += 1
+        delta = abs((pd.to_datetime(date, format=DATE_FORMAT) -
+                     pd.to_datetime(truth['時間'], format=DATE_FORMAT)).total_seconds())
+        if delta <= time_tolerance_sec:
+            time_matches += 1
+    return {'expected': len(expected), 'predicted': len(predicted), 'value_matches': value_matches,
+            'time_matches': time_matches, 'exact': len(predicted) == len(expected) == value_matches}
+
+def run_benchmark(video_path, crop_xywh, batch_size=8, pipeline_workers=2, gate_threshold=20.0):
+    model = get_model(MODEL_PATH, confThreshold=CONF_THRESHOLD, nmsThreshold=NMS_THRESHOLD)
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    start = time.perf_counter()
+    measure_df = process_video(video_path, crop_xywh, batch_size=batch_size, model_local=model,
+                               pipeline_workers=pipeline_workers, gate_threshold=gate_threshold)
+    elapsed = time.perf_counter() - start
+
+    report = {
+        'video': video_path,
+        'frames': total_frames,
+        'elapsed_sec': elapsed,
+        'frames_per_sec': total_frames / elapsed if elapsed > 0 else 0.0,
+        'stages': profile_stages(video_path, crop_xywh, model, batch_size),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    truth_file = video_path + ".json"
+    if os.path.exists(truth_file):
+        with open(truth_file, encoding="utf-8") as f:
+            report['ground_truth'] = check_ground_truth(measure_df, json.load(f)['expected'])
+    return report
+
+def print_report(report):
+    print(f"video        : {report['video']}")
+    print(f"frames       : {report['frames']}  ({report['frames_per_sec']:.1f} frames/s, {report['elapsed_sec']:.2f} s)")
+    print(f"peak RSS     : {report['peak_rss_mb']:.1f} MB")
+    for stage, stats in report['stages'].items():
+        if stats:
+            print(f"{stage:<13}: n={stats['count']:<7} mean={stats['mean_ms']:.3f} ms  p50={stats['p50_ms']:.3f}  "
+                  f"p90={stats['p90_ms']:.3f}  p99={stats['p99_ms']:.3f}")
+    if 'ground_truth' in report:
+        print(f"ground truth : {report['ground_truth']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the weight detection pipeline on CPU")
+    parser.add_argument('videos', nargs='*', help="videos to benchmark; a synthetic one is generated if omitted")
+    parser.add_argument('--settings', default='settings.ini')
+    parser.add_argument('--duration', type=float, default=600.0, help="synthetic video length in seconds")
+    parser.add_argument('--fps', type=float, default=25.0)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--out-dir', default='bench_videos')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--pipeline-workers', type=int, default=2)
+    parser.add_argument('--gate-threshold', type=float, default=20.0)
+    parser.add_argument('--json', help="write the report(s) to this file")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    crop_xywh = read_crop(args.settings)
+    videos = args.videos or [make_synthetic_video(args.out_dir, args.duration, args.fps,
+                                                  (args.width, args.height), crop_xywh)]
+    reports = []
+    for video in videos:
+        report = run_benchmark(video, crop_xywh, args.batch_size, args.pipeline_workers, args.gate_threshold)
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    return 0 if all(r.get('ground_truth', {}).get('exact', True) for r in reports) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
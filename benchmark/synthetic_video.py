@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import configparser
+import cv2
+import numpy as np
+
+# 七段顯示器各段的位置 (以 digit 寬高的比例表示)：(x0, y0, x1, y1)
+SEGMENT_LINES = {
+    'a': (0.15, 0.05, 0.85, 0.05),
+    'b': (0.85, 0.05, 0.85, 0.50),
+    'c': (0.85, 0.50, 0.85, 0.95),
+    'd': (0.15, 0.95, 0.85, 0.95),
+    'e': (0.15, 0.50, 0.15, 0.95),
+    'f': (0.15, 0.05, 0.15, 0.50),
+    'g': (0.15, 0.50, 0.85, 0.50),
+}
+
+DIGIT_SEGMENTS = {
+    0: 'abcdef', 1: 'bc', 2: 'abdeg', 3: 'abcdg', 4: 'bcfg',
+    5: 'acdfg', 6: 'acdefg', 7: 'abc', 8: 'abcdefg', 9: 'abcdfg',
+}
+
+def read_crop(config_file="settings.ini"):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return [config.getint('CROP', 'X'),
+            config.getint('CROP', 'Y'),
+            config.getint('CROP', 'W'),
+            config.getint('CROP', 'H')]
+
+def draw_digit(img, digit, x, y, w, h, color=(40, 40, 255)):
+    thickness = max(1, int(w * 0.18))
+    for segment in DIGIT_SEGMENTS[digit]:
+        x0, y0, x1, y1 = SEGMENT_LINES[segment]
+        cv2.line(img, (int(x + x0 * w), int(y + y0 * h)), (int(x + x1 * w), int(y + y1 * h)),
+                 color, thickness, lineType=cv2.LINE_AA)
+
+def render_reading(w, h, value, digits=4):
+    """畫出一位小數的讀值，例如 12.3 -> '12.3'，0 -> '0.0'"""
+    roi = np.full((h, w, 3), 20, dtype=np.uint8)
+    text = str(int(round(value * 10))).rjust(2, '0')
+    digit_w = w // digits
+    margin = max(1, h // 10)
+    x = w - digit_w * len(text)
+    for i, ch in enumerate(text):
+        draw_digit(roi, int(ch), x + i * digit_w + margin, margin, digit_w - 2 * margin, h - 2 * margin)
+        if i == len(text) - 2:
+            # 小數點
+            cv2.circle(roi, (x + (i + 1) * digit_w - margin // 2, h - margin), max(1, margin // 2),
+                       (40, 40, 255), -1)
+    return roi
+
+def default_schedule(duration_sec, hold_sec=20.0, gap_sec=25.0, seed=0):
+    """產生秤重時間表 [(開始秒, 結束秒, 數值), ...]，其餘時間顯示 0"""
+    rng = np.random.default_rng(seed)
+    schedule = []
+    t = gap_sec
+    while t + hold_sec + gap_sec <= duration_sec:
+        value = round(float(rng.uniform(1.5, 99.9)), 1)
+        schedule.append((t, t + hold_sec, value))
+        t += hold_sec + gap_sec
+    return schedule
+
+def reading_at(schedule, t):
+    for start, end, value in schedule:
+        if start <= t < end:
+            return value
+    return 0.0
+
+def video_filename(start_time, ext="mp4"):
+    # 與 DVR 檔名相同的格式，process_video 由第 4 段取得開始時間
+    end_time = start_time + datetime.timedelta(hours=1)
+    return f"NVR_ch1_main_{start_time:%Y%m%d%H%M%S}_{end_time:%Y%m%d%H%M%S}.{ext}"
+
+def generate_video(path, crop_xywh, duration_sec, fps, resolution, schedule, seed=0):
+    width, height = resolution
+    crop_x, crop_y, crop_w, crop_h = crop_xywh
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open video writer for {path}")
+
+    rng = np.random.default_rng(seed)
+    background = rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+    frame = background.copy()
+    rois = {}
+    for i in range(int(duration_sec * fps)):
+        value = reading_at(schedule, i / fps)
+        if value not in rois:
+            rois[value] = render_reading(crop_w, crop_h, value)
+        frame[crop_y:crop_y + crop_h, crop_x:crop_x + crop_w] = rois[value]
+        writer.write(frame)
+    writer.release()
+
+def expected_measurements(schedule, start_time):
+    return [{'數值': value, '時間': (start_time + datetime.timedelta(seconds=end)).strftime("%Y-%m-%d-%H:%M:%S")}
+            for _, end, value in schedule]
+
+def make_synthetic_video(out_dir, duration_sec=600.0, fps=25.0, resolution=(1920, 1080), crop_xywh=None,
+                         start_time=datetime.datetime(2024, 1, 1, 8, 0, 0), seed=0):
+    """產生影片與 ground truth (同名 .json)，回傳影片路徑"""
+    crop_xywh = crop_xywh or read_crop()
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, video_filename(start_time))
+    schedule = default_schedule(duration_sec, seed=seed)
+    generate_video(path, crop_xywh, duration_sec, fps, resolution, schedule, seed=seed)
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({'crop': crop_xywh, 'fps': fps, 'duration': duration_sec, 'schedule': schedule,
+                   'expected': expected_measurements(schedule, start_time)}, f, ensure_ascii=False, indent=2)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic scale-display video")
+    parser.add_argument('--out-dir', default='bench_videos')
+    parser.add_argument('--duration', type=float, default=600.0, help="seconds")
+    parser.add_argument('--fps', type=float, default=25.0)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--settings', default='settings.ini')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    path = make_synthetic_video(args.out_dir, args.duration, args.fps, (args.width, args.height),
+                                read_crop(args.settings), seed=args.seed)
+    print(path)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+import cv2
+
+from tool.sample_buffer import SampleBuffer
+
+VIDEO_NAME = "NVR_ch1_main_20240101080000_20240101090000.mp4"
+ROI = [20, 21, 120, 60]
+FPS = 25
+START = 1704096000  # 2024-01-01 08:00:00
+READINGS = [0.0, 0.0, 0.0, -1, 1.5, 7.8, 12.3, 45.6, 99.9, 123.4]
+
+class FakeModel():
+    """以 ROI 的平均亮度當作讀值 (亮度 = 讀值 * 25)，結果只由畫面決定；calls 為推論的 ROI 數"""
+    def __init__(self):
+        self.calls = 0
+
+    def detect_batch(self, rois, metrics=None):
+        self.calls += len(rois)
+        predictions = []
+        for roi in rois:
+            value = int(round(float(roi.mean()) / 25))
+            # [x, y, w, h, conf, class]，convert_to_number 依 x 排序後組成 value.5
+            predictions.append([[0, 0, 10, 20, 0.9, value], [12, 0, 10, 20, 0.9, 5]] if value > 0
+                               else [[0, 0, 10, 20, 0.9, 0]])
+        return predictions
+
+def write_schedule_video(path, schedule, size=(160, 120)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, size)
+    x, y, w, h = ROI
+    for value in schedule:
+        frame = np.full((size[1], size[0], 3), 40, np.uint8)
+        frame[y:y + h, x:x + w] = value * 25
+        writer.write(frame)
+    writer.release()
+
+@pytest.fixture(scope="session")
+def schedule_video(tmp_path_factory):
+    """秤重 (讀值 1~9 維持一段時間) 與歸零交替的影片，回傳 (路徑, 每幀的讀值)"""
+    rng = np.random.default_rng(0)
+    schedule = []
+    for _ in range(8):
+        schedule += [0] * int(rng.integers(100, 300))
+        schedule += [int(rng.integers(1, 10))] * int(rng.integers(150, 400))
+    schedule += [0] * 120
+    path = str(tmp_path_factory.mktemp("video") / VIDEO_NAME)
+    write_schedule_video(path, schedule)
+    return path, schedule
+
+@pytest.fixture
+def fake_model():
+    return FakeModel()
+
+def legacy_analyze_number_date(df):
+    """原本以 iterrows / groupby 實作的版本，作為 analyze_number_date 的比對基準"""
+    result = []
+    current_number = None
+    count = 0
+    for i, row in df.iterrows():
+        if row['number'] == current_number:
+            count += 1
+        else:
+            if current_number is not None:
+                result.append([current_number, count, previous_date])
+            current_number = row['number']
+            count = 1
+        previous_date = row['date']
+    result.append([current_number, count, previous_date])
+    result_df = pd.DataFrame(result, columns=['number', 'count', 'date'])
+    condition = (result_df['number'] == 0.0) & (result_df['count'] > 30)
+    result_df['group'] = condition.cumsum()
+    subsequences = [sub_df for _, sub_df in result_df.groupby('group') if not (sub_df['number'].nunique() == 1 and sub_df['number'].iloc[0] == 0.0)]
+    results = []
+    measure_count = 1
+    for i, subsequence in enumerate(subsequences):
+        grouped_df = subsequence.groupby(['number', 'group']).agg(
+            count=('count', 'sum'),
+            date=('date', 'max')
+        ).reset_index()
+        filtered_subseq = grouped_df[(grouped_df['number'] >= 1.0) & (grouped_df['count'] > 30)]
+        if not filtered_subseq.empty:
+            max_row = filtered_subseq.loc[filtered_subseq['count'].idxmax()]
+            results.append((measure_count, max_row['number'], max_row['date']))
+            measure_count += 1
+    df_max_values = pd.DataFrame(results, columns=["測量", "數值", "時間"])
+    return df_max_values
+
+def random_samples(seed):
+    """隨機的讀值序列：穩定的讀值、長短不一的 0 值區段、偶爾閃爍的誤判，時間每秒約 8 筆"""
+    rng = np.random.default_rng(seed)
+    data = SampleBuffer()
+    frame = 1
+    for _ in range(rng.integers(1, 40)):
+        number = READINGS[rng.integers(len(READINGS))]
+        for _ in range(rng.integers(1, 90)):
+            # 偶爾夾雜一筆其他讀值
+            sample = READINGS[rng.integers(len(READINGS))] if rng.random() < 0.05 else number
+            data.append(frame, sample, START + frame // 8)
+            frame += 3
+    return data.to_dataframe()
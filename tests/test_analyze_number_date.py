@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+from tool.utils import analyze_number_date
+from tool.sample_buffer import SampleBuffer, readings_to_float
+from tool.timestamps import format_timestamps
+from conftest import legacy_analyze_number_date, random_samples
+
+def rows(df):
+    return [(int(count), float(number), str(date)) for count, number, date in df.itertuples(index=False, name=None)]
+
+@pytest.mark.parametrize('seed', range(60))
+def test_matches_legacy_implementation(seed):
+    df = random_samples(seed)
+    # 原本的每幀資料為 Python float 與時間字串
+    legacy_df = pd.DataFrame({'number': readings_to_float(df['number'].to_numpy()),
+                              'date': format_timestamps(df['date'].to_numpy())})
+    expected = rows(legacy_analyze_number_date(legacy_df))
+    assert rows(analyze_number_date(df)) == expected
+    # 時間為字串時 (舊的快取資料) 結果相同
+    assert rows(analyze_number_date(legacy_df)) == expected
+
+def test_empty():
+    df = SampleBuffer().to_dataframe()
+    assert list(analyze_number_date(df).columns) == ["測量", "數值", "時間"]
+    assert len(analyze_number_date(df)) == 0
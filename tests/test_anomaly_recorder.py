@@ -0,0 +1,53 @@
+import os
+import csv
+import shutil
+import multiprocessing
+import pytest
+
+import tool.video_pool
+from tool.anomaly_recorder import merge_indexes, INDEX_HEADER
+from tool.video_pool import process_videos_in_pool
+from tool.processing_options import processing_options
+from conftest import FakeModel, ROI
+
+def read_index(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+def write_index(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        csv.writer(f).writerows([INDEX_HEADER] + rows)
+
+def test_merge_indexes_appends_in_order(tmp_path):
+    write_index(tmp_path / "a.csv", [['a1.png', 'a', '', '1', 't', '0', 'low_conf']])
+    write_index(tmp_path / "b.csv", [['b1.png', 'b', '', '2', 't', '0', 'jump'],
+                                     ['b2.png', 'b', '', '3', 't', '-1', 'no_detection']])
+    merge_indexes(str(tmp_path), ["a.csv", "missing.csv", "b.csv"])
+    merge_indexes(str(tmp_path), ["a.csv"])
+    rows = read_index(tmp_path / "anomalies.csv")
+    assert rows[0] == INDEX_HEADER
+    assert [row[0] for row in rows[1:]] == ['a1.png', 'b1.png', 'b2.png']
+    assert not os.path.exists(tmp_path / "a.csv") and not os.path.exists(tmp_path / "b.csv")
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+def test_pool_writes_one_index(tmp_path, monkeypatch, schedule_video):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tool.video_pool, 'get_model', lambda *args, **kwargs: FakeModel())
+    path, _ = schedule_video
+    videos = []
+    for channel in ("ch1", "ch2", "ch3"):
+        video = str(tmp_path / os.path.basename(path).replace("ch1", channel))
+        shutil.copy(path, video)
+        videos.append(video)
+    out_dir = str(tmp_path / "anomalies")
+    # FakeModel 的信心值都是 0.9，每個推論的取樣都算 low_conf
+    options = {'out_dir': out_dir, 'low_conf': 0.95, 'max_files': 1000}
+    results = list(process_videos_in_pool(videos, ROI, processing_options(num_workers=3, anomaly_options=options)))
+    assert len(results) == 3
+    rows = read_index(os.path.join(out_dir, "anomalies.csv"))
+    assert rows[0] == INDEX_HEADER and INDEX_HEADER not in rows[1:]
+    per_video = {os.path.basename(video): 0 for video in videos}
+    for row in rows[1:]:
+        per_video[row[1]] += 1
+    assert len(set(per_video.values())) == 1 and per_video[os.path.basename(videos[0])] > 0
+    assert not any(name.startswith("anomalies_") for name in os.listdir(out_dir))
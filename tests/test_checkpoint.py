@@ -0,0 +1,118 @@
+import os
+import json
+import multiprocessing
+import pytest
+
+from tool.checkpoint import Checkpoint
+from tool.utils import process_video, result_cache_key, checkpoint_header
+from tool.result_cache import ResultCache
+from conftest import FakeModel, ROI
+
+HEADER = {'video': 'a.dav', 'crop': [1, 2, 3, 4]}
+ROWS = [(3 * i + 1, float(i % 7), f"2024-01-01-08:00:{i:02d}") for i in range(20)]
+
+def test_load_skips_incomplete_line(tmp_path):
+    path = str(tmp_path / "a.ckpt")
+    checkpoint = Checkpoint(path, HEADER, interval=0)
+    checkpoint.open([])
+    for row in ROWS[:12]:
+        checkpoint.add(*row)
+    # 寫到一半當機：最後一行不完整，也沒有 close
+    checkpoint.file.write('{"rows": [[40, 1.0, "2024-')
+    checkpoint.file.flush()
+    assert Checkpoint(path, HEADER).load() == ROWS[:12]
+
+def test_open_keeps_only_confirmed_rows(tmp_path):
+    path = str(tmp_path / "a.ckpt")
+    checkpoint = Checkpoint(path, HEADER, interval=3600)
+    checkpoint.open(ROWS[:5])
+    for row in ROWS[5:]:
+        checkpoint.add(*row)
+    checkpoint.close()
+    assert Checkpoint(path, HEADER).load() == ROWS
+    resumed = Checkpoint(path, HEADER)
+    resumed.open(ROWS[:8])
+    resumed.close()
+    assert Checkpoint(path, HEADER).load() == ROWS[:8]
+
+def test_header_mismatch_discards_file(tmp_path):
+    path = str(tmp_path / "a.ckpt")
+    checkpoint = Checkpoint(path, HEADER, interval=0)
+    checkpoint.open(ROWS)
+    checkpoint.close()
+    changed = Checkpoint(path, dict(HEADER, crop=[1, 2, 3, 5]))
+    assert changed.load() == []
+    changed.open([])
+    changed.close()
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'header': changed.header}]
+    assert Checkpoint(path, HEADER).load() == []
+
+class CrashingModel(FakeModel):
+    """推論 limit 個 ROI 之後直接結束 process，模擬當機 (不會執行 finally、不會 close 進度檔)"""
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def detect_batch(self, rois, metrics=None):
+        if self.calls >= self.limit:
+            os._exit(1)
+        return super().detect_batch(rois, metrics)
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+class TestResume():
+    CRASH_AFTER = 400
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, schedule_video):
+        self.tmp_path = tmp_path
+        self.path, _ = schedule_video
+        self.checkpoint_path = str(tmp_path / "video.ckpt")
+        # 快取的 key 與進度檔的 header 含模型 hash，以一個小檔案代替模型
+        self.modelpath = str(tmp_path / "fake.onnx")
+        with open(self.modelpath, 'wb') as f:
+            f.write(b"fake")
+
+    def run(self, model, name, gate_threshold=None):
+        # 每次各用一個快取，只用來取出每幀的資料比對
+        cache = ResultCache(str(self.tmp_path / name))
+        measure_df = process_video(self.path, ROI, model_local=model, gate_threshold=gate_threshold, cache=cache,
+                                   checkpoint_path=self.checkpoint_path, checkpoint_interval=0, modelpath=self.modelpath)
+        key = result_cache_key(cache, self.path, ROI, self.modelpath, 3, None, gate_threshold, None, None, 'opencv', 1)
+        return measure_df, cache.load_frames(key)
+
+    def crash(self, limit, gate_threshold=None):
+        """在另一個 process 處理到一半當機，回傳進度檔中已寫入的取樣"""
+        process = multiprocessing.get_context('fork').Process(
+            target=self.run, args=(CrashingModel(limit), "crashed", gate_threshold))
+        process.start()
+        process.join()
+        assert process.exitcode == 1
+        header = checkpoint_header(self.path, ROI, self.modelpath, 3, None, gate_threshold, None, None, 'opencv', 1)
+        return Checkpoint(self.checkpoint_path, header).load()
+
+    def test_resume_matches_uninterrupted_run(self):
+        full_model = FakeModel()
+        full_df, full_frames = self.run(full_model, "full")
+        assert not os.path.exists(self.checkpoint_path)
+
+        rows = self.crash(self.CRASH_AFTER)
+        assert 0 < len(rows) <= self.CRASH_AFTER
+        resumed_model = FakeModel()
+        resumed_df, resumed_frames = self.run(resumed_model, "resumed")
+        # 當機前已寫進進度檔的取樣不再推論
+        assert resumed_model.calls == full_model.calls - len(rows)
+        assert resumed_frames.equals(full_frames)
+        assert resumed_df.equals(full_df)
+        assert not os.path.exists(self.checkpoint_path)
+
+    def test_changed_settings_start_over(self):
+        full_model = FakeModel()
+        full_df, _ = self.run(full_model, "full")
+        # gate 沿用預測時不呼叫模型，推論幾次就會有數百個取樣
+        assert len(self.crash(5, gate_threshold=20.0)) > 0
+        # 進度檔是以不同的 gate 門檻產生的，整個作廢重新處理
+        model = FakeModel()
+        measure_df, _ = self.run(model, "changed")
+        assert model.calls == full_model.calls
+        assert measure_df.equals(full_df)
@@ -0,0 +1,59 @@
+import shutil
+import numpy as np
+import pytest
+import cv2
+
+from tool.ffmpeg_capture import FFmpegROICapture, FFMPEG
+
+pytestmark = pytest.mark.skipif(shutil.which(FFMPEG) is None, reason="ffmpeg not found")
+
+FRAMES = 12
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    """每個像素的值都不同的漸層，裁切位置差一個像素就會不一樣"""
+    path = str(tmp_path_factory.mktemp("ffmpeg") / "gradient.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (320, 240))
+    yy, xx = np.mgrid[0:240, 0:320]
+    for i in range(FRAMES):
+        frame = np.empty((240, 320, 3), np.uint8)
+        frame[..., 0] = (yy * 3 + i) % 256
+        frame[..., 1] = (xx * 2) % 256
+        frame[..., 2] = ((xx + yy) * 5) % 256
+        writer.write(frame)
+    writer.release()
+    return path
+
+def opencv_rois(path, crop_xywh, step):
+    x, y, w, h = crop_xywh
+    cap = cv2.VideoCapture(path)
+    rois = []
+    frame_count = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        if frame_count % step == 0:
+            rois.append(frame[y:y + h, x:x + w].copy())
+    cap.release()
+    return rois
+
+def ffmpeg_rois(path, crop_xywh, step):
+    cap = FFmpegROICapture(path, crop_xywh, step=step)
+    rois = []
+    while cap.grab():
+        ret, roi = cap.retrieve()
+        if ret:
+            rois.append(roi.copy())
+    cap.release()
+    return rois
+
+@pytest.mark.parametrize("crop_xywh", [[40, 28, 120, 60], [41, 29, 120, 60], [40, 29, 120, 60], [41, 28, 60, 30]])
+@pytest.mark.parametrize("step", [1, 3])
+def test_roi_matches_opencv(video, crop_xywh, step):
+    expected = opencv_rois(video, crop_xywh, step)
+    actual = ffmpeg_rois(video, crop_xywh, step)
+    assert len(actual) == len(expected) == FRAMES // step
+    for a, e in zip(actual, expected):
+        np.testing.assert_array_equal(a, e)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import cv2
+
+from tool.frame_sampler import FrameSampler
+from tool.utils import iter_sampled_frames
+from tool.timestamps import parse_start_time
+from conftest import FPS
+
+START_TIME = "20240101080000"
+FRAMES = 300
+BITS = 9
+BLOCK = 16
+
+@pytest.fixture(scope="module")
+def index_video(tmp_path_factory):
+    """每一幀以 BITS 個黑白方塊記錄自己的 index (由 0 開始)"""
+    path = str(tmp_path_factory.mktemp("video") / f"NVR_ch1_main_{START_TIME}_20240101090000.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, (BITS * BLOCK, BLOCK))
+    for index in range(FRAMES):
+        frame = np.zeros((BLOCK, BITS * BLOCK, 3), np.uint8)
+        for bit in range(BITS):
+            if index >> bit & 1:
+                frame[:, bit * BLOCK:(bit + 1) * BLOCK] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+def frame_index(frame):
+    blocks = frame[:, :, 1].reshape(BLOCK, BITS, BLOCK).mean(axis=(0, 2))
+    return sum(1 << bit for bit in range(BITS) if blocks[bit] > 127)
+
+def sampled(path, **kwargs):
+    cap = cv2.VideoCapture(path)
+    try:
+        sampler = FrameSampler(cap, step=kwargs.pop('sample_step', 1))
+        return [(frame_count, timestamp, frame_index(frame))
+                for frame_count, timestamp, frame in iter_sampled_frames(cap, sampler, START_TIME, **kwargs)]
+    finally:
+        cap.release()
+
+def test_step_sampler_is_one_based(index_video):
+    rows = sampled(index_video, sample_step=3)
+    assert [frame_count for frame_count, _, _ in rows] == list(range(3, FRAMES + 1, 3))
+    assert all(index == frame_count - 1 for frame_count, _, index in rows)
+
+@pytest.mark.parametrize("interval_msec", [120, 1000, 360])
+def test_time_sampler_matches_step_sampler(index_video, interval_msec):
+    every_frame = {frame_count: (timestamp, index) for frame_count, timestamp, index in sampled(index_video)}
+    assert len(every_frame) == FRAMES
+    rows = sampled(index_video, sample_interval_msec=interval_msec)
+    assert len(rows) == -(-FRAMES * 1000 // FPS // interval_msec)
+    # 同一幀在兩種取樣方式下的幀編號、時間、畫面都相同
+    for frame_count, timestamp, index in rows:
+        assert every_frame[frame_count] == (timestamp, index)
+    assert rows[0][0] == 1 and rows[0][1] == parse_start_time(START_TIME)
+
+@pytest.mark.parametrize("start_frame", [2, 4, 37, 76, 151])
+def test_time_sampler_resume(index_video, start_frame):
+    # 中斷後從 start_frame 繼續：與從頭處理時 frame_count >= start_frame 的部分相同
+    full = sampled(index_video, sample_interval_msec=120)
+    resumed = sampled(index_video, sample_interval_msec=120, start_frame=start_frame)
+    assert resumed == [row for row in full if row[0] >= start_frame]
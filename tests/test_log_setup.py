@@ -0,0 +1,62 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+import tool.video_pool
+from tool.log_setup import setup_logging, stop_logging, worker_log_queue, setup_worker_logging
+from conftest import FakeModel
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    setup_logging(str(tmp_path / "process.log"), force=True)
+    yield tmp_path / "process.log"
+    stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def read_log(path):
+    # 先停止 listener，確保 queue 中的 log 都已寫進檔案
+    stop_logging()
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+def log_from_worker(message):
+    logging.info(f"{message} from {os.getpid()}")
+    return os.getpid()
+
+def test_worker_records_reach_parent_log(log_file):
+    # 與實際的 process pool 相同，使用預設的啟動方式 (Windows 為 spawn)
+    logging.info("parent ready")
+    with ProcessPoolExecutor(max_workers=2, initializer=setup_worker_logging,
+                             initargs=(worker_log_queue(),)) as executor:
+        pids = set(executor.map(log_from_worker, ["hello"] * 8))
+    text = read_log(log_file)
+    assert "parent ready" in text
+    for pid in pids:
+        assert f"hello from {pid}" in text
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+def test_pool_workers_do_not_write_own_files(log_file, tmp_path, monkeypatch):
+    monkeypatch.setattr(tool.video_pool, 'get_model', lambda *args, **kwargs: FakeModel())
+    with ProcessPoolExecutor(max_workers=2, initializer=tool.video_pool.init_worker,
+                             initargs=("model.onnx", 1, worker_log_queue())) as executor:
+        pids = set(executor.map(log_from_worker, ["shard"] * 4))
+    text = read_log(log_file)
+    assert all(f"Worker {pid} ready" in text for pid in pids)
+    assert sorted(os.listdir(tmp_path)) == ["process.log"]
+
+def test_without_parent_logging():
+    # 主 process 沒有設定 log 時不建立 queue，worker 維持原本的設定
+    stop_logging()
+    assert worker_log_queue() is None
+    handlers = logging.getLogger().handlers[:]
+    setup_worker_logging(None)
+    assert logging.getLogger().handlers == handlers
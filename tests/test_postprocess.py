@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import cv2
+
+from tool.yolov6_utils import yolov6
+
+def legacy_postprocess(model, frame, outs, padsize):
+    """原本逐筆處理的 yolov6.postprocess (不畫框)，作為比對基準"""
+    frameHeight = frame.shape[0]
+    frameWidth = frame.shape[1]
+    newh, neww, padh, padw = padsize
+    ratioh, ratiow = frameHeight / newh, frameWidth / neww
+    confidences = []
+    boxes = []
+    classIds = []
+    for detection in outs:
+        if detection[4] > model.confThreshold:
+            scores = detection[5:]
+            classId = np.argmax(scores)
+            confidence = scores[classId] * detection[4]
+            if confidence > model.confThreshold:
+                center_x = int((detection[0] - padw) * ratiow)
+                center_y = int((detection[1] - padh) * ratioh)
+                width = int(detection[2] * ratiow)
+                height = int(detection[3] * ratioh)
+                left = int(center_x - width * 0.5)
+                top = int(center_y - height * 0.5)
+                confidences.append(float(confidence))
+                boxes.append([left, top, width, height])
+                classIds.append(classId)
+    bbox = []
+    if len(boxes) != 0:
+        indices = cv2.dnn.NMSBoxes(boxes, confidences, model.confThreshold, model.nmsThreshold)
+        for i in np.asarray(indices).flatten():
+            bbox.append([*boxes[i], confidences[i], classIds[i]])
+    return bbox
+
+def make_model(conf_threshold=0.7, nms_threshold=0.5):
+    # 只測後處理，不需要 ONNX session
+    model = yolov6.__new__(yolov6)
+    model.confThreshold = conf_threshold
+    model.nmsThreshold = nms_threshold
+    model.annotate = False
+    return model
+
+def random_outs(rng, count=60, classes=10):
+    outs = np.empty((count, 5 + classes), dtype=np.float32)
+    outs[:, 0] = rng.uniform(0, 320, count)
+    outs[:, 1] = rng.uniform(80, 240, count)
+    outs[:, 2] = rng.uniform(4, 60, count)
+    outs[:, 3] = rng.uniform(10, 120, count)
+    outs[:, 4] = rng.uniform(0.5, 1.0, count)
+    outs[:, 5:] = rng.uniform(0, 1, (count, classes))
+    # 幾筆 objectness 剛好落在門檻上下 (float32 的相鄰值)
+    threshold = np.float32(0.7)
+    outs[:3, 4] = [np.nextafter(threshold, np.float32(0)), threshold, np.nextafter(threshold, np.float32(1))]
+    outs[:3, 5] = 1.0
+    return outs
+
+def normalize(bbox):
+    return [[int(v) for v in box[:4]] + [float(box[4]), int(box[5])] for box in bbox]
+
+@pytest.mark.parametrize("conf_threshold", [0.7, 0.55, 0.9])
+@pytest.mark.parametrize("frame_shape", [(120, 240, 3), (60, 120, 3), (90, 60, 3)])
+def test_postprocess_matches_legacy(conf_threshold, frame_shape):
+    rng = np.random.default_rng(int(conf_threshold * 100) + frame_shape[1])
+    model = make_model(conf_threshold)
+    frame = np.zeros(frame_shape, dtype=np.uint8)
+    padsize = (160, 320, 80, 0)
+    for _ in range(100):
+        outs = random_outs(rng)
+        _, bbox = model.postprocess(frame, outs, padsize)
+        assert normalize(bbox) == normalize(legacy_postprocess(model, frame, outs, padsize))
+
+def test_postprocess_empty():
+    model = make_model()
+    _, bbox = model.postprocess(np.zeros((120, 240, 3), np.uint8), np.zeros((0, 15), np.float32), (160, 320, 80, 0))
+    assert bbox == []
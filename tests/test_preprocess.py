@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+import cv2
+
+from tool.utils import prepare_frame
+from tool.yolov6_utils import LetterboxBuffer, roi_input_size
+
+def legacy_input_tensor(frame, crop_xywh, inpHeight=320, inpWidth=320):
+    """原本 process_frame + yolov6.detect 的前處理 (crop -> 240x120 -> letterbox -> RGB / 255)，作為比對基準"""
+    x, y, w, h = crop_xywh
+    srcimg = cv2.resize(frame[y:y + h, x:x + w], (240, 120))
+    top, left, newh, neww = 0, 0, inpWidth, inpHeight
+    if srcimg.shape[0] != srcimg.shape[1]:
+        hw_scale = srcimg.shape[0] / srcimg.shape[1]
+        if hw_scale > 1:
+            newh, neww = inpHeight, int(inpWidth / hw_scale)
+            img = cv2.resize(srcimg, (neww, newh), interpolation=cv2.INTER_AREA)
+            left = int((inpWidth - neww) * 0.5)
+            img = cv2.copyMakeBorder(img, 0, 0, left, inpWidth - neww - left, cv2.BORDER_CONSTANT,
+                                     value=(114, 114, 114))
+        else:
+            newh, neww = int(inpHeight * hw_scale), inpWidth
+            img = cv2.resize(srcimg, (neww, newh), interpolation=cv2.INTER_AREA)
+            top = int((inpHeight - newh) * 0.5)
+            img = cv2.copyMakeBorder(img, top, inpHeight - newh - top, 0, 0, cv2.BORDER_CONSTANT,
+                                     value=(114, 114, 114))
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+    return np.transpose(img, (2, 0, 1))
+
+@pytest.mark.parametrize("input_size", [320, 256])
+@pytest.mark.parametrize("crop_xywh", [[880, 249, 120, 60], [100, 40, 97, 61], [10, 10, 60, 90]])
+def test_input_tensor_matches_legacy(crop_xywh, input_size):
+    rng = np.random.default_rng(sum(crop_xywh) + input_size)
+    buffer = LetterboxBuffer(input_size, input_size, max_batch=1)
+    roi_size = roi_input_size(input_size, input_size)
+    for _ in range(5):
+        frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+        # 實際畫面比隨機雜訊平滑，一半的畫面先模糊過
+        frame = cv2.GaussianBlur(frame, (0, 0), 3) if rng.random() < 0.5 else frame
+        buffer.fill(0, prepare_frame(frame, crop_xywh, roi_size))
+        np.testing.assert_array_equal(buffer.tensor[0], legacy_input_tensor(frame, crop_xywh, input_size, input_size))
@@ -0,0 +1,56 @@
+import inspect
+import configparser
+import pytest
+
+from tool.cli import build_parser, options_from_args
+from tool.utils import process_video, MODEL_PATH
+from tool.processing_options import (processing_options, processing_options_from_config, video_kwargs,
+                                     DEFAULT_OPTIONS)
+
+def make_config(sections):
+    config = configparser.ConfigParser()
+    config.read_dict(sections)
+    return config
+
+def test_defaults_without_settings():
+    options = processing_options_from_config(make_config({}))
+    # [CHECKPOINT] 預設啟用，其他與 DEFAULT_OPTIONS 相同
+    assert options == dict(DEFAULT_OPTIONS, checkpoint_interval=60.0)
+
+def test_from_config():
+    options = processing_options_from_config(make_config({
+        'PROCESS': {'WORKERS': '3', 'SHARDS': '2', 'DECODER': 'ffmpeg', 'ADAPTIVE_SEC': '0.5', 'GATE_THRESHOLD': '0'},
+        'MODEL': {'PATH': 'int8.onnx'},
+        'METRICS': {'ENABLED': '1', 'PROFILER': 'cprofile'},
+        'CHECKPOINT': {'ENABLED': '0'},
+        'CASCADE': {'ENABLED': '1', 'AUDIT': '0.1'},
+    }))
+    assert options['num_workers'] == 3 and options['shards'] == 2 and options['decoder'] == 'ffmpeg'
+    assert options['modelpath'] == 'int8.onnx' and options['adaptive_sec'] == 0.5
+    assert options['gate_threshold'] is None and options['checkpoint_interval'] is None
+    assert options['metrics_enabled'] and options['profiler'] == 'cprofile' and options['cascade_audit'] == 0.1
+
+def test_unknown_option():
+    with pytest.raises(TypeError):
+        processing_options(workers=2)
+
+def test_video_kwargs_match_process_video():
+    parameters = inspect.signature(process_video).parameters
+    kwargs = video_kwargs(processing_options(metrics_enabled=True, checkpoint_interval=30.0), "./videos/a.dav")
+    assert set(kwargs) <= set(parameters)
+    assert kwargs['metrics_path'] == "./a.dav_metrics" and kwargs['checkpoint_path'] == "./a.dav.ckpt"
+    kwargs = video_kwargs(processing_options(), "./videos/a.dav")
+    assert kwargs['metrics_path'] is None and kwargs['checkpoint_path'] is None
+    assert kwargs['modelpath'] == MODEL_PATH
+
+def test_command_line_overrides_settings():
+    config = make_config({'PROCESS': {'WORKERS': '3', 'GATE_THRESHOLD': '25'}, 'CASCADE': {'ENABLED': '1'},
+                          'CACHE': {'ENABLED': '1'}})
+    args = build_parser().parse_args(["a.dav", "--shards", "4", "--gate-threshold", "0", "--no-cascade",
+                                      "--no-cache", "--anomaly-dir", "out"])
+    options = options_from_args(config, args)
+    assert options['num_workers'] == 3 and options['shards'] == 4
+    assert options['gate_threshold'] is None and options['cascade_audit'] is None and options['cache'] is None
+    assert options['anomaly_options'] == {'out_dir': 'out'}
+    args = build_parser().parse_args(["a.dav"])
+    assert options_from_args(config, args)['gate_threshold'] == 25.0
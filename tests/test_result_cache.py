@@ -0,0 +1,58 @@
+import os
+import pytest
+
+from tool.result_cache import ResultCache
+from tool.utils import result_cache_key, checkpoint_header
+
+VIDEO_NAME = "NVR_ch2_main_20240101080000_20240101090000.mp4"
+BASE = dict(crop_xywh=[880, 249, 120, 60], sample_step=3, sample_interval_msec=None, gate_threshold=20.0,
+            adaptive_sec=None, cascade_audit=None, decoder='opencv', shards=1)
+CHANGES = [
+    ('crop_xywh', [880, 250, 120, 60]),
+    ('sample_step', 5),
+    ('sample_interval_msec', 200),
+    ('gate_threshold', None),
+    ('adaptive_sec', 1.0),
+    ('cascade_audit', 0.02),
+    ('decoder', 'ffmpeg'),
+    ('shards', 3),
+]
+
+@pytest.fixture
+def files(tmp_path):
+    video = tmp_path / VIDEO_NAME
+    video.write_bytes(b"video" * 100)
+    model = tmp_path / "model.onnx"
+    model.write_bytes(b"model")
+    return str(video), str(model)
+
+def key(cache, video, model, **params):
+    params = dict(BASE, **params)
+    crop = params.pop('crop_xywh')
+    return result_cache_key(cache, video, crop, model, **params)
+
+def header(video, model, **params):
+    params = dict(BASE, **params)
+    crop = params.pop('crop_xywh')
+    return checkpoint_header(video, crop, model, **params)
+
+def test_same_settings_hit(tmp_path, files):
+    cache = ResultCache(str(tmp_path / "cache"))
+    assert key(cache, *files) == key(cache, *files)
+    assert header(*files) == header(*files)
+
+@pytest.mark.parametrize("name,value", CHANGES)
+def test_changed_setting_misses(tmp_path, files, name, value):
+    cache = ResultCache(str(tmp_path / "cache"))
+    assert key(cache, *files, **{name: value}) != key(cache, *files)
+    assert header(*files, **{name: value}) != header(*files)
+
+def test_start_time_in_key(tmp_path, files):
+    cache = ResultCache(str(tmp_path / "cache"))
+    video, model = files
+    renamed = tmp_path / VIDEO_NAME.replace("20240101080000_", "20240102080000_")
+    renamed.write_bytes(open(video, 'rb').read())
+    # 內容與 mtime 都相同，只有檔名中的開始時間不同
+    stat = os.stat(video)
+    os.utime(renamed, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert key(cache, str(renamed), model) != key(cache, video, model)
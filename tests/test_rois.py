@@ -0,0 +1,30 @@
+import configparser
+import pytest
+
+from tool.rois import rois_from_config, rois_to_config, check_roi_name, roi_path, result_csv_name
+
+@pytest.mark.parametrize("name", ["main", "tare", "皮重", "scale-2", "a.b", "ROI_1"])
+def test_valid_names(name):
+    assert check_roi_name(name) == name
+
+@pytest.mark.parametrize("name", ["", "a/b", "a\\b", "C:x", "a b", ".hidden", "..", "x]"])
+def test_invalid_names(name):
+    with pytest.raises(ValueError):
+        check_roi_name(name)
+
+def test_config_round_trip():
+    config = configparser.ConfigParser()
+    rois = {'scale': [1, 2, 3, 4], 'tare': [5, 6, 7, 8]}
+    rois_to_config(config, rois)
+    assert rois_from_config(config) == rois
+
+def test_config_rejects_unsafe_name():
+    config = configparser.ConfigParser()
+    config.read_dict({'CROP': {'X': '1', 'Y': '2', 'W': '3', 'H': '4'}, 'CROP:a/b': {'X': '1'}})
+    with pytest.raises(ValueError):
+        rois_from_config(config)
+
+def test_file_names():
+    assert roi_path("./a.dav.ckpt", "tare") == "./a.dav.tare.ckpt"
+    assert result_csv_name("a.dav") == "a.dav_result.csv"
+    assert result_csv_name("a.dav", "tare") == "a.dav_tare_result.csv"
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from tool.segmenter import MeasurementSegmenter
+from tool.sample_buffer import readings_to_float
+from tool.timestamps import format_timestamp, format_timestamps
+from conftest import legacy_analyze_number_date, random_samples
+
+@pytest.mark.parametrize('seed', range(300))
+def test_matches_legacy_analyze_number_date(seed):
+    df = random_samples(seed)
+    numbers = readings_to_float(df['number'].to_numpy())
+    legacy_df = pd.DataFrame({'number': numbers, 'date': format_timestamps(df['date'].to_numpy())})
+    expected = [(int(count), float(number), str(date))
+                for count, number, date in legacy_analyze_number_date(legacy_df).itertuples(index=False)]
+
+    emitted = []
+    segmenter = MeasurementSegmenter(emitted.append, format_date=format_timestamp)
+    returned = [segmenter.push(frame, number, date)
+                for frame, number, date in zip(df['frame'].tolist(), numbers, df['date'].tolist())]
+    returned.append(segmenter.finish())
+    assert emitted == expected
+    # push / finish 的回傳值與 callback 相同，分隔出現時就已輸出，不必等到 finish
+    assert [measurement for measurement in returned if measurement is not None] == emitted
+    assert segmenter.measurements == emitted
+
+def test_no_measurement():
+    segmenter = MeasurementSegmenter()
+    for frame in range(1, 100):
+        assert segmenter.push(frame, 0.0, frame) is None
+    assert segmenter.finish() is None
+    assert segmenter.measurements == []
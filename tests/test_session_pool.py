@@ -0,0 +1,82 @@
+import os
+import threading
+import pytest
+
+import tool.session_pool
+from tool.session_pool import get_model
+
+class FakeSession():
+    """代替 yolov6：記錄建立的次數，on_create 可讓建立過程停在中途"""
+    created = []
+    on_create = None
+
+    def __init__(self, modelpath, **kwargs):
+        with open(modelpath, 'rb') as f:
+            self.content = f.read()
+        if FakeSession.on_create is not None:
+            FakeSession.on_create(modelpath)
+        FakeSession.created.append(self)
+
+    def warmup(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def fake_session(monkeypatch):
+    monkeypatch.setattr(tool.session_pool, 'yolov6', FakeSession)
+    monkeypatch.setattr(tool.session_pool, '_models', {})
+    monkeypatch.setattr(FakeSession, 'created', [])
+    monkeypatch.setattr(FakeSession, 'on_create', None)
+
+def write_model(path, content, mtime_ns):
+    with open(path, 'wb') as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+def test_reuses_session(tmp_path):
+    path = write_model(tmp_path / "a.onnx", b"v1", 10 ** 18)
+    model = get_model(path)
+    assert get_model(path) is model
+    assert get_model(os.path.relpath(path)) is model
+    assert get_model(path, confThreshold=0.7) is not model
+    assert len(FakeSession.created) == 2
+
+# 檔案大小或修改時間改變時重新建立
+@pytest.mark.parametrize("content, mtime_ns", [(b"v22", 10 ** 18), (b"v1", 2 * 10 ** 18)])
+def test_replaced_file_creates_new_session(tmp_path, content, mtime_ns):
+    path = write_model(tmp_path / "a.onnx", b"v1", 10 ** 18)
+    old = get_model(path)
+    write_model(path, content, mtime_ns)
+    new = get_model(path)
+    assert new is not old and new.content == content
+    # 舊版本的 session 不再保留
+    assert list(tool.session_pool._models.values()) == [new]
+
+def test_creation_does_not_hold_lock(tmp_path):
+    slow_path = write_model(tmp_path / "slow.onnx", b"slow", 10 ** 18)
+    fast_path = write_model(tmp_path / "fast.onnx", b"fast", 10 ** 18)
+    fast_model = get_model(fast_path)
+    started, release = threading.Event(), threading.Event()
+
+    def on_create(modelpath):
+        if modelpath == slow_path:
+            started.set()
+            assert release.wait(10)
+    FakeSession.on_create = on_create
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(get_model(slow_path)))
+    thread.start()
+    try:
+        assert started.wait(10)
+        # 另一個模型建立到一半時，已建立的模型與新的模型都可以取得
+        assert get_model(fast_path) is fast_model
+        assert get_model(fast_path, nmsThreshold=0.4).content == b"fast"
+    finally:
+        release.set()
+        thread.join()
+    assert get_model(slow_path) is results[0]
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_model(str(tmp_path / "missing.onnx"))
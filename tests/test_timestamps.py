@@ -0,0 +1,66 @@
+import math
+import datetime
+from fractions import Fraction
+import numpy as np
+import pytest
+
+from tool.timestamps import FrameClock, parse_start_time, format_timestamp, format_timestamps
+
+def time2str(year, month, day, hour, minute, second):
+    """原本輸出時間字串的函數，作為格式的比對基準"""
+    str_month = f"0{month}" if month < 10 else str(month)
+    str_day = f"0{day}" if day < 10 else str(day)
+    str_hour = f"0{hour}" if hour < 10 else str(hour)
+    str_minute = f"0{minute}" if minute < 10 else str(minute)
+    str_second = f"0{second}" if second < 10 else str(second)
+    return f"{year}-{str_month}-{str_day}-{str_hour}:{str_minute}:{str_second}"
+
+def legacy_string(time_string, seconds=0):
+    t = datetime.datetime.strptime(time_string, "%Y%m%d%H%M%S") + datetime.timedelta(seconds=seconds)
+    return time2str(t.year, t.month, t.day, t.hour, t.minute, t.second)
+
+@pytest.mark.parametrize("time_string", ["20240101080000", "20240228235959", "20241231235930", "19991231000000",
+                                         "20240131120000", "20230930090909"])
+def test_format_matches_legacy_string(time_string):
+    start = parse_start_time(time_string)
+    offsets = [0, 1, 29, 30, 59, 60, 3599, 3600, 86399, 86400, 86401, 31 * 86400, 400 * 86400]
+    expected = [legacy_string(time_string, offset) for offset in offsets]
+    assert [format_timestamp(start + offset) for offset in offsets] == expected
+    assert format_timestamps([start + offset for offset in offsets]).tolist() == expected
+
+# OpenCV 回報的 fps：整數、NTSC (24000/1001、30000/1001 或四捨五入後的 29.97)、12.5 ...
+@pytest.mark.parametrize("fps", [25.0, 29.97, 24000 / 1001, 30000 / 1001, 60000 / 1001, 12.5, 15.0, 7.5])
+def test_at_frame_rounding(fps):
+    start = parse_start_time("20240101080000")
+    clock = FrameClock(start, fps)
+    # 浮點數 fps 對應的實際幀率 (24000 / 1001 的浮點數略大於實際值，直接相除會在整秒少算一秒)
+    exact_fps = Fraction(fps).limit_denominator(1001)
+    # 四小時內每個整秒的邊界前後幾幀，與精確分數計算的 floor((frame_count - 1) / fps) 相同
+    for second in range(4 * 3600):
+        boundary = math.ceil(second * exact_fps) + 1
+        for frame_count in (boundary - 1, boundary, boundary + 1):
+            if frame_count >= 1:
+                expected = start + math.floor((frame_count - 1) / exact_fps)
+                assert clock.at_frame(frame_count) == expected, frame_count
+
+def test_at_frame_does_not_drift():
+    # 原本每 int(fps) = 29 幀加一秒，29.97 fps 每小時快約 2 分鐘；以實際 fps 計算，一小時後剛好 3600 秒
+    clock = FrameClock(0, 29.97)
+    assert clock.at_frame(1) == 0
+    assert clock.at_frame(round(3600 * 29.97) + 1) == 3600
+    assert clock.at_frame(round(3600 * 29.97)) == 3599
+
+@pytest.mark.parametrize("pos_msec, seconds", [(0.0, 0), (999.9999, 0), (1000.0, 1), (59999.0, 59), (3600000.5, 3600)])
+def test_at_msec(pos_msec, seconds):
+    assert FrameClock(100, None).at_msec(pos_msec) == 100 + seconds
+
+@pytest.mark.parametrize("fps", [0, 0.0, -1.0, None, float('nan')])
+def test_missing_fps(fps):
+    # 沒有 fps 時改用 CAP_PROP_POS_MSEC
+    assert FrameClock(0, fps).fps is None
+
+def test_parse_start_time():
+    assert parse_start_time("19700101000000") == 0
+    assert parse_start_time("20240101080000") == 1704096000
+    assert isinstance(parse_start_time("20240101080000"), int)
+    assert format_timestamp(np.int64(parse_start_time("20240229120000"))) == "2024-02-29-12:00:00"
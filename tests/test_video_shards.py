@@ -0,0 +1,62 @@
+import json
+import multiprocessing
+import pytest
+
+import tool.video_pool
+from tool.utils import process_video, result_cache_key, MODEL_PATH
+from tool.result_cache import ResultCache
+from tool.video_shards import shard_ranges, split_max_files
+from conftest import FakeModel, ROI
+
+# 各段的 worker 以 fork 繼承替換過的 get_model，不需載入真正的模型
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason="needs fork start method")
+
+SHARDS = 3
+
+@pytest.fixture
+def run(tmp_path, monkeypatch, schedule_video):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tool.video_pool, 'get_model', lambda *args, **kwargs: FakeModel())
+    # 快取的 key 含模型 hash，以一個小檔案代替模型
+    modelpath = tmp_path / "fake.onnx"
+    modelpath.write_bytes(b"fake")
+    cache = ResultCache(str(tmp_path / "cache"))
+    path, _ = schedule_video
+
+    def run(shards, gate_threshold):
+        metrics_path = str(tmp_path / f"metrics_{shards}_{gate_threshold}")
+        measure_df = process_video(path, ROI, model_local=FakeModel(), cache=cache, shards=shards,
+                                   gate_threshold=gate_threshold, modelpath=str(modelpath),
+                                   metrics_path=metrics_path)
+        key = result_cache_key(cache, path, ROI, str(modelpath), 3, None, gate_threshold, None, None,
+                               'opencv', shards)
+        with open(f"{metrics_path}.json", encoding="utf-8") as f:
+            counters = json.load(f)['counters']
+        return measure_df, cache.load_frames(key), counters
+    return run
+
+def test_shards_match_sequential_without_gate(run):
+    sequential_df, sequential_frames, _ = run(1, None)
+    sharded_df, sharded_frames, _ = run(SHARDS, None)
+    assert len(sequential_df) > 0
+    assert sharded_frames.equals(sequential_frames)
+    assert sharded_df.equals(sequential_df)
+
+def test_shards_with_gate(run):
+    sequential_df, sequential_frames, sequential_counters = run(1, 20.0)
+    sharded_df, sharded_frames, sharded_counters = run(SHARDS, 20.0)
+    # 讀值只由畫面決定時結果相同；每段重新開始的 gate 只讓每段第一個取樣多推論一次
+    assert sharded_frames.equals(sequential_frames)
+    assert sharded_df.equals(sequential_df)
+    extra = sharded_counters['inferred_frames'] - sequential_counters['inferred_frames']
+    assert 0 <= extra <= SHARDS - 1
+
+def test_shard_ranges_cover_video():
+    ranges = shard_ranges(5, 100, 4)
+    assert ranges[0][0] == 5 and ranges[-1][1] is None
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert shard_ranges(1, 2, 8) == [(1, 2), (2, None)]
+
+def test_split_max_files():
+    assert split_max_files(500, 3) == [166, 167, 167]
+    assert sum(split_max_files(7, 4)) == 7
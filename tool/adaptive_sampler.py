@@ -0,0 +1,84 @@
+class AdaptiveSampler():
+    """
+    自適應取樣：每 coarse_step 個取樣點才推論一次
+      相鄰兩個推論結果相同 -> 中間的取樣點直接沿用同一個數值
+      結果不同           -> 在兩點之間再取點推論 (一次最多 batch_size 個)，逐段縮小到相鄰取樣點為止
+    輸出仍然是每個取樣點一筆 (frame, number, timestamp)，analyze_number_date 的次數規則不受影響
+    中間的取樣點只保留裁切後的 ROI，細分時不需要 seek 回去重新解碼
+    """
+    def __init__(self, detect, coarse_step=10, batch_size=8, max_windows=8):
+        """
+        detect      : detect(rois) -> [number, ...]
+        max_windows : 累積幾個 coarse 區間再一起推論，讓 coarse 取樣點也能批次送進模型
+        """
+        self.detect = detect
+        self.coarse_step = max(1, coarse_step)
+        self.batch_size = max(1, batch_size)
+        self.max_windows = max(1, max_windows)
+        self.points = []    # [(frame_count, timestamp, roi)]，第 0 筆為上一段最後一個已推論的點
+        self.numbers = []   # 與 points 對應，尚未推論為 None
+        self.inferred = 0
+
+    def push(self, frame_count, timestamp, roi):
+        """回傳已確定數值的 [(frame, number, timestamp), ...]"""
+        self.points.append((frame_count, timestamp, roi))
+        self.numbers.append(None)
+        if len(self.points) > self.coarse_step * self.max_windows:
+            return self.resolve(len(self.points) - 1)
+        return []
+
+    def finish(self):
+        if not self.points:
+            return []
+        rows = self.resolve(len(self.points) - 1)
+        # 最後一個點也要輸出
+        rows.append(self.row(0))
+        self.points, self.numbers = [], []
+        return rows
+
+    def row(self, i):
+        frame_count, timestamp, _ = self.points[i]
+        return frame_count, self.numbers[i], timestamp
+
+    def infer(self, indices):
+        for start in range(0, len(indices), self.batch_size):
+            chunk = indices[start:start + self.batch_size]
+            for i, number in zip(chunk, self.detect([self.points[i][2] for i in chunk])):
+                self.numbers[i] = number
+        self.inferred += len(indices)
+
+    def resolve(self, last):
+        """決定 points[0:last] 的數值並輸出，points[last] 留下來當作下一段的起點"""
+        anchors = list(range(0, last, self.coarse_step)) + [last]
+        self.infer([i for i in anchors if self.numbers[i] is None])
+
+        intervals = list(zip(anchors, anchors[1:]))
+        while True:
+            split = [hi - lo > 1 and self.numbers[lo] != self.numbers[hi] for lo, hi in intervals]
+            if not any(split):
+                break
+            # 需要細分的區間平分這一批的名額，每個區間至少一個點 (即二分法)
+            per_interval = max(1, self.batch_size // sum(split))
+            probes = []
+            next_intervals = []
+            for (lo, hi), needs_split in zip(intervals, split):
+                if not needs_split:
+                    next_intervals.append((lo, hi))
+                    continue
+                count = min(per_interval, hi - lo - 1)
+                cuts = [lo + (hi - lo) * (k + 1) // (count + 1) for k in range(count)]
+                probes.extend(cuts)
+                bounds = [lo] + cuts + [hi]
+                next_intervals.extend(zip(bounds, bounds[1:]))
+            self.infer(probes)
+            intervals = next_intervals
+
+        # 兩端數值相同的區間，中間的點沿用同一個數值
+        for lo, hi in intervals:
+            for i in range(lo + 1, hi):
+                self.numbers[i] = self.numbers[lo]
+
+        rows = [self.row(i) for i in range(last)]
+        self.points = self.points[last:]
+        self.numbers = self.numbers[last:]
+        return rows
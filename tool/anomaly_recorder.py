@@ -0,0 +1,129 @@
+import os
+import csv
+import queue
+import logging
+import threading
+import cv2
+from .yolov6_utils import draw_detections
+from .timestamps import format_timestamp
+
+_STOP = object()
+INDEX_NAME = "anomalies.csv"
+INDEX_HEADER = ['file', 'video', 'roi', 'frame', 'time', 'number', 'reason']
+
+class AnomalyRecorder():
+    """
+    只把異常的取樣存成標好偵測框的 ROI 圖片，供除錯用：
+      no_detection : 沒有偵測到數字 (number == -1)
+      low_conf     : 有偵測框的信心值低於 low_conf
+      jump         : 與同一個 ROI 上一次的非零讀值相差超過 max_jump (0 表示不檢查)
+    畫框與寫檔在背景執行緒進行；queue 滿了就丟棄，不會拖慢處理
+    每張圖另外記一行到 {out_dir}/{index_name} (預設 anomalies.csv)
+    """
+    def __init__(self, out_dir, prefix, low_conf=0.8, max_jump=50.0, max_files=500, queue_size=64,
+                 index_name=INDEX_NAME):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.index_path = os.path.join(out_dir, index_name)
+        self.low_conf = low_conf
+        self.max_jump = max_jump
+        self.max_files = max_files
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last = {}        # ROI 名稱 -> 上一次的非零讀值
+        self.submitted = 0
+        self.dropped = 0
+        self.reasons = {}
+        os.makedirs(out_dir, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def reason(self, prediction, number, name=None):
+        if number == -1:
+            return 'no_detection'
+        if any(box[4] < self.low_conf for box in prediction):
+            return 'low_conf'
+        previous = self.last.get(name)
+        if number > 0:
+            self.last[name] = number
+            if self.max_jump and previous is not None and abs(number - previous) > self.max_jump:
+                return 'jump'
+        return None
+
+    def check(self, frame_count, timestamp, roi, prediction, number, name=None):
+        """在推論的執行緒呼叫；只有異常時才複製 ROI 送進 queue"""
+        reason = self.reason(prediction, number, name)
+        if reason is None:
+            return None
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        if self.submitted >= self.max_files:
+            self.dropped += 1
+            return reason
+        try:
+            self.queue.put_nowait((frame_count, timestamp, roi.copy(), list(prediction), number, name, reason))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+        return reason
+
+    def run(self):
+        new_index = not os.path.exists(self.index_path)
+        with open(self.index_path, 'a', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            if new_index:
+                writer.writerow(INDEX_HEADER)
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    break
+                frame_count, timestamp, roi, prediction, number, name, reason = item
+                label = f"{self.prefix}_{name}" if name is not None else self.prefix
+                filename = f"{label}_{frame_count:08d}_{reason}.png"
+                try:
+                    cv2.imwrite(os.path.join(self.out_dir, filename), draw_detections(roi, prediction))
+                    writer.writerow([filename, self.prefix, name or '', frame_count, format_timestamp(timestamp),
+                                     number, reason])
+                    f.flush()
+                except Exception as e:
+                    logging.error(f"Anomaly recorder failed to write {filename}: {e}")
+
+    def close(self):
+        """等背景執行緒寫完已排入的圖片"""
+        self.queue.put(_STOP)
+        self.thread.join()
+        if self.reasons:
+            logging.info(f"Anomalies in {self.prefix}: {self.reasons}, saved={self.submitted}, dropped={self.dropped}")
+
+    def stats(self):
+        return {'anomalies': sum(self.reasons.values()), 'anomalies_dropped': self.dropped}
+
+def merge_indexes(out_dir, index_names, target=INDEX_NAME):
+    """
+    把各個 process (影片或切段) 各自寫的索引依序接到 {out_dir}/{target} 後刪除
+    只在主 process 呼叫，避免多個 process 同時寫同一個檔案
+    """
+    index_path = os.path.join(out_dir, target)
+    parts = [os.path.join(out_dir, name) for name in index_names if os.path.exists(os.path.join(out_dir, name))]
+    if not parts:
+        return
+    new_index = not os.path.exists(index_path)
+    with open(index_path, 'a', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        if new_index:
+            writer.writerow(INDEX_HEADER)
+        for part in parts:
+            with open(part, newline='', encoding='utf-8-sig') as src:
+                rows = csv.reader(src)
+                next(rows, None)
+                writer.writerows(rows)
+            os.remove(part)
+
+def anomaly_options_from_config(config):
+    """由 settings.ini 的 [ANOMALY] 取得 AnomalyRecorder 的設定，未啟用時回傳 None"""
+    if not config.getboolean('ANOMALY', 'ENABLED', fallback=False):
+        return None
+    return {
+        'out_dir': config.get('ANOMALY', 'DIR', fallback='./anomalies'),
+        'low_conf': config.getfloat('ANOMALY', 'LOW_CONF', fallback=0.8),
+        'max_jump': config.getfloat('ANOMALY', 'MAX_JUMP', fallback=50.0),
+        'max_files': config.getint('ANOMALY', 'MAX_FILES', fallback=500),
+    }
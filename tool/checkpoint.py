@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import logging
+
+class Checkpoint():
+    """
+    長影片處理的進度檔 (append-only, 每行一筆 JSON)：
+      第一行 {"header": ...}                       影片指紋與處理設定，不同時整個檔案作廢
+      之後   {"rows": [[frame, number, date], ...]} 自上一筆之後新增的每幀預測
+    每隔 interval 秒寫一筆並 fsync；中途當機時，最後一行可能只寫了一半，讀取時略過
+    """
+    def __init__(self, path, header, interval=60.0):
+        self.path = path
+        self.header = header
+        self.interval = interval
+        self.pending = []
+        self.last_write = time.monotonic()
+        self.file = None
+
+    def load(self):
+        """回傳之前已處理的 [(frame, number, date), ...]，沒有可用的進度時回傳 []"""
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Checkpoint {self.path}: ignoring incomplete line {i + 1}")
+                    break
+                if i == 0:
+                    if record.get('header') != self.header:
+                        logging.info(f"Checkpoint {self.path} was made with different settings, starting over")
+                        return []
+                    continue
+                rows.extend(tuple(row) for row in record['rows'])
+        return rows
+
+    def open(self, rows):
+        """重寫進度檔，只保留已確認的 rows，之後以附加方式寫入"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'header': self.header}, ensure_ascii=False) + "\n")
+            if rows:
+                f.write(json.dumps({'rows': [list(row) for row in rows]}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.last_write = time.monotonic()
+
+    def add(self, frame, number, date):
+        self.pending.append((int(frame), float(number), date))
+        if time.monotonic() - self.last_write >= self.interval:
+            self.write()
+
+    def write(self):
+        self.last_write = time.monotonic()
+        if not self.pending or self.file is None:
+            return
+        self.file.write(json.dumps({'rows': self.pending}, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        logging.info(f"Checkpoint written: {self.path}, last frame {self.pending[-1][0]}")
+        self.pending = []
+
+    def close(self, remove=False):
+        if self.file is not None:
+            if not remove:
+                self.write()
+            self.file.close()
+            self.file = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+def checkpoint_interval_from_config(config):
+    """由 settings.ini 的 [CHECKPOINT] 取得寫入間隔 (秒)，未啟用時回傳 None"""
+    if not config.getboolean('CHECKPOINT', 'ENABLED', fallback=True):
+        return None
+    return config.getfloat('CHECKPOINT', 'INTERVAL_SEC', fallback=60.0)
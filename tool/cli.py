@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import configparser
+from .log_setup import setup_logging
+from .rois import rois_from_config, check_roi_name, result_csv_name
+
+# 與 GUI 上傳影片時的篩選相同
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.dav')
+
+def collect_videos(inputs):
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(path, name))
+        else:
+            videos.append(path)
+    return videos
+
+def load_settings(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return config
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="weight_detect cli",
+                                     description="Process videos without the GUI and write result CSVs")
+    parser.add_argument('inputs', nargs='+', help="video files or directories")
+    parser.add_argument('--out-dir', default='.', help="where {video}_result.csv files are written")
+    parser.add_argument('--settings', default='settings.ini')
+    parser.add_argument('--crop', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                        help="override the [CROP] section of the settings file")
+    parser.add_argument('--roi', nargs=5, action='append', metavar=('NAME', 'X', 'Y', 'W', 'H'),
+                        help="add (or override) a named ROI like a [CROP:NAME] section; repeatable")
+    parser.add_argument('--workers', type=int, help="override [PROCESS] workers")
+    parser.add_argument('--shards', type=int, help="override [PROCESS] shards (processes per video when videos run one at a time)")
+    parser.add_argument('--model', help="override [MODEL] path, e.g. an INT8 model made by tool.quantize")
+    parser.add_argument('--decoder', choices=['opencv', 'ffmpeg'], help="override [PROCESS] decoder")
+    parser.add_argument('--adaptive-sec', type=float,
+                        help="override [PROCESS] adaptive_sec (seconds between coarse samples, 0 = every sample)")
+    parser.add_argument('--gate-threshold', type=float,
+                        help="override [PROCESS] gate_threshold (max thumbnail pixel change that reuses the previous "
+                             "prediction, 0 = always run the model)")
+    parser.add_argument('--cascade-audit', type=float,
+                        help="enable the template-matching cascade and audit this fraction of its answers with the model "
+                             "(overrides [CASCADE], 0 = no audits)")
+    parser.add_argument('--no-cascade', action='store_true', help="always run the model, ignoring [CASCADE]")
+    parser.add_argument('--anomaly-dir',
+                        help="save annotated ROIs of suspicious samples (no detection, low confidence, jumps) here "
+                             "(enables [ANOMALY] with its other settings)")
+    parser.add_argument('--metrics', action='store_true', help="export {video}_metrics.json / .csv")
+    parser.add_argument('--profiler', choices=['none', 'cprofile', 'pyinstrument'])
+    parser.add_argument('--no-checkpoint', action='store_true', help="do not write or resume from {video}.ckpt")
+    parser.add_argument('--no-cache', action='store_true', help="ignore the [CACHE] section and reprocess every video")
+    return parser
+
+def options_from_args(config, args):
+    """settings.ini 的處理選項，再換上命令列指定的值"""
+    from .processing_options import processing_options_from_config
+    options = processing_options_from_config(config)
+    for key, value in (('num_workers', args.workers), ('shards', args.shards), ('decoder', args.decoder),
+                       ('modelpath', args.model), ('profiler', args.profiler)):
+        if value:
+            options[key] = value
+    if args.metrics:
+        options['metrics_enabled'] = True
+    # 這兩項指定 0 表示不使用
+    if args.adaptive_sec is not None:
+        options['adaptive_sec'] = args.adaptive_sec or None
+    if args.gate_threshold is not None:
+        options['gate_threshold'] = args.gate_threshold or None
+    if args.cascade_audit is not None:
+        options['cascade_audit'] = args.cascade_audit
+    if args.no_cascade:
+        options['cascade_audit'] = None
+    if args.anomaly_dir:
+        options['anomaly_options'] = dict(options['anomaly_options'] or {}, out_dir=args.anomaly_dir)
+    if args.no_checkpoint:
+        options['checkpoint_interval'] = None
+    if args.no_cache:
+        options['cache'] = None
+    return options
+
+def main(argv=None, startup_begin=None):
+    startup_begin = startup_begin if startup_begin is not None else time.perf_counter()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    config = load_settings(args.settings)
+    try:
+        rois = rois_from_config(config)
+        if args.crop:
+            rois[next(iter(rois))] = args.crop
+        for name, *xywh in args.roi or []:
+            rois[check_roi_name(name)] = [int(v) for v in xywh]
+    except ValueError as e:
+        parser.error(str(e))
+    # 只有一個 ROI 時與原本相同；多個 ROI 時每部影片一次解碼，每個 ROI 各輸出一個 CSV
+    crop_xywh = next(iter(rois.values())) if len(rois) == 1 else rois
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("No videos found", file=sys.stderr)
+        return 1
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    # 較慢的模組在確定有工作要做之後才載入
+    from .utils import process_video
+    from .video_pool import process_videos_in_pool
+    from .processing_options import video_kwargs
+    options = options_from_args(config, args)
+
+    startup = time.perf_counter() - startup_begin
+    logging.info(f"Startup time: {startup:.3f} seconds")
+    print(f"startup: {startup:.3f} s")
+
+    if options['num_workers'] > 1 and len(videos) > 1:
+        results = process_videos_in_pool(videos, crop_xywh, options)
+    else:
+        results = ((video, process_video(video, crop_xywh, **video_kwargs(options, video))) for video in videos)
+
+    for i, (video, result) in enumerate(results):
+        tables = result if isinstance(result, dict) else {None: result}
+        for name, measure_df in tables.items():
+            csv_file = os.path.join(args.out_dir, result_csv_name(os.path.basename(video), name))
+            measure_df.to_csv(csv_file, index=False, encoding='utf-8-sig')
+            logging.info(f"CSV written: {csv_file}")
+            print(f"[{i + 1}/{len(videos)}] {video} -> {csv_file} ({len(measure_df)} measurements)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+import random
+import logging
+from collections import deque
+import cv2
+import numpy as np
+from .metrics import NULL_METRICS
+
+def digits_of(prediction):
+    """由左到右的 class id，即讀到的數字序列"""
+    return tuple(int(box[5]) for box in sorted(prediction, key=lambda box: box[0]))
+
+class DigitSlot():
+    """顯示器上固定位置的一個數字格，記住各數字 (class id) 在這一格的二值化樣板"""
+    def __init__(self, box, max_templates=4):
+        self.box = list(box)  # [left, top, width, height]，ROI 座標
+        self.max_templates = max_templates
+        self.templates = {}   # class id -> deque of 正規化後的 glyph 向量
+        self.seen_blank = False
+        self.matrix = None    # 所有樣板疊成的矩陣，樣板改變時重建
+        self.labels = None
+
+    def overlaps(self, box):
+        left, _, width, _ = box
+        overlap = min(self.box[0] + self.box[2], left + width) - max(self.box[0], left)
+        return overlap > 0.5 * min(self.box[2], width)
+
+    def expand(self, box):
+        """格子範圍取聯集 (例如 1 比 8 窄)；範圍改變時舊樣板的幾何不同，全部捨棄"""
+        left = min(self.box[0], box[0])
+        top = min(self.box[1], box[1])
+        right = max(self.box[0] + self.box[2], box[0] + box[2])
+        bottom = max(self.box[1] + self.box[3], box[1] + box[3])
+        expanded = [left, top, right - left, bottom - top]
+        if expanded != self.box:
+            self.box = expanded
+            self.templates.clear()
+            self.matrix = None
+
+    def add(self, classid, glyph, duplicate=0.97):
+        templates = self.templates.setdefault(classid, deque(maxlen=self.max_templates))
+        # 跟既有樣板幾乎一樣就不再加入
+        if any(float(glyph @ t) >= duplicate for t in templates):
+            return
+        templates.append(glyph)
+        self.matrix = None
+
+    def scores(self, glyph):
+        """回傳 (最佳 class, 最佳分數, 其他 class 的最佳分數)；沒有樣板時回傳 None"""
+        if self.matrix is None:
+            if not self.templates:
+                return None
+            self.labels = np.array([c for c, ts in self.templates.items() for _ in ts])
+            self.matrix = np.stack([t for ts in self.templates.values() for t in ts])
+        scores = self.matrix @ glyph
+        best = int(np.argmax(scores))
+        others = scores[self.labels != self.labels[best]]
+        return int(self.labels[best]), float(scores[best]), float(others.max()) if len(others) else -1.0
+
+class DigitCascade():
+    """
+    兩段式辨識：先用便宜的樣板比對，不確定時才送進 yolov6
+      樣板比對 : ROI 二值化 (Otsu) 後，依各數字格切出 glyph，與該格各數字的樣板做正規化相關
+      數字格與樣板都由 yolov6 的結果學習 (顯示器位置固定)，一開始全部送進模型，學到之後才開始省略
+      每格都要 分數 >= min_score 且比其他數字高出 margin、格子外沒有多出的筆畫，否則視為不確定
+      (七段顯示的 0 與 8 只差中間一段，相關約 0.9，margin 不能設太大)
+    另外隨機抽 audit_fraction 比例的確定結果送進模型比對；最近 audit_window 次抽查的一致率
+    低於 min_agreement 時停用樣板比對 (累計的一致率在長時間正常之後，對鏡頭移動等變化反應太慢)
+    介面與 yolov6 相同 (detect / detect_batch)，可直接取代 model_local
+    """
+    def __init__(self, model, audit_fraction=0.02, min_score=0.85, margin=0.05, glyph_size=(12, 20),
+                 max_templates=4, min_audits=20, min_agreement=0.95, audit_window=100, seed=0):
+        self.model = model
+        self.audit_fraction = audit_fraction
+        self.min_score = min_score
+        self.margin = margin
+        self.glyph_size = glyph_size
+        self.max_templates = max_templates
+        self.min_audits = min_audits
+        self.min_agreement = min_agreement
+        self.random = random.Random(seed)
+        self.slots = []
+        self.enabled = True
+        self.hits = 0         # 由樣板比對直接回答
+        self.fallbacks = 0    # 不確定，送進模型
+        self.audits = 0       # 樣板比對確定、但抽查送進模型
+        self.agreements = 0   # 抽查結果一致
+        self.recent_audits = deque(maxlen=audit_window)  # 最近的抽查是否一致
+
+    def binarize(self, roi):
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 筆畫 (前景) 為少數像素；亮底暗字時反轉
+        if binary.mean() > 0.5:
+            binary = 1 - binary
+        return binary
+
+    def glyph(self, binary, box):
+        """回傳 (正規化後的 glyph 向量, 筆畫比例)；空白格回傳 (None, 比例)"""
+        left, top, width, height = box
+        patch = binary[max(0, top):top + height, max(0, left):left + width]
+        if patch.size == 0:
+            return None, 0.0
+        glyph = cv2.resize(patch.astype(np.float32), self.glyph_size, interpolation=cv2.INTER_AREA).ravel()
+        ink = float(glyph.mean())
+        glyph -= ink
+        norm = float(np.linalg.norm(glyph))
+        if ink < 0.02 or norm < 1e-6:
+            return None, ink
+        return glyph / norm, ink
+
+    def recognize(self, roi):
+        """確定時回傳與 yolov6 相同格式的 bbox [left, top, width, height, conf, classid]，否則回傳 None"""
+        if not self.enabled or not self.slots:
+            return None
+        binary = self.binarize(roi)
+        total_ink = int(binary.sum())
+        slot_ink = 0
+        bbox = []
+        for slot in self.slots:
+            glyph, _ = self.glyph(binary, slot.box)
+            left, top, width, height = slot.box
+            slot_ink += int(binary[max(0, top):top + height, max(0, left):left + width].sum())
+            if glyph is None:
+                if not slot.seen_blank:
+                    return None
+                continue
+            scores = slot.scores(glyph)
+            if scores is None:
+                return None
+            classid, best, second = scores
+            if best < self.min_score or best - second < self.margin:
+                return None
+            bbox.append([left, top, width, height, best, classid])
+        # 格子外還有不少筆畫 (例如多出一位數)，交給模型
+        if not bbox or total_ink - slot_ink > 0.15 * max(total_ink, 1):
+            return None
+        return bbox
+
+    def learn(self, roi, bbox):
+        """用模型的結果更新數字格與樣板"""
+        if not bbox:
+            return
+        matched = []
+        for left, top, width, height, _, classid in bbox:
+            box = [left, top, width, height]
+            slot = next((s for s in self.slots if s.overlaps(box)), None)
+            if slot is None:
+                slot = DigitSlot(box, self.max_templates)
+                self.slots.append(slot)
+                self.slots.sort(key=lambda s: s.box[0])
+            elif slot in (s for s, _ in matched):
+                # 兩個框落在同一格，不確定是哪一個，這次不學
+                return
+            slot.expand(box)
+            matched.append((slot, int(classid)))
+
+        binary = self.binarize(roi)
+        for slot, classid in matched:
+            glyph, _ = self.glyph(binary, slot.box)
+            if glyph is not None:
+                slot.add(classid, glyph)
+        for slot in self.slots:
+            if all(slot is not s for s, _ in matched) and self.glyph(binary, slot.box)[0] is None:
+                slot.seen_blank = True
+
+    def triage(self, srcimgs, metrics=NULL_METRICS):
+        """
+        先做樣板比對，回傳 (results, todo, audited)：
+          results : 樣板比對確定的 bbox，需要模型的位置為 None
+          todo    : 需要送進模型的 index (不確定 + 抽查)
+          audited : 抽查的 {index: 樣板比對的 bbox}
+        多個 ROI 可各自 triage 後，把 todo 合成一次模型推論，再各自 merge
+        """
+        results = [None] * len(srcimgs)
+        audited = {}
+        with metrics.timer('cascade'):
+            for i, srcimg in enumerate(srcimgs):
+                bbox = self.recognize(srcimg)
+                if bbox is None:
+                    self.fallbacks += 1
+                    continue
+                if self.random.random() < self.audit_fraction:
+                    audited[i] = bbox
+                    continue
+                self.hits += 1
+                results[i] = bbox
+        todo = [i for i, bbox in enumerate(results) if bbox is None]
+        return results, todo, audited
+
+    def merge(self, srcimgs, results, todo, audited, bboxes):
+        """填入模型對 todo 的結果 (並學習)，比對抽查結果"""
+        for i, bbox in zip(todo, bboxes):
+            results[i] = bbox
+            self.learn(srcimgs[i], bbox)
+        for i, bbox in audited.items():
+            self.check_audit(bbox, results[i])
+        return results
+
+    def detect_batch(self, srcimgs, metrics=NULL_METRICS):
+        results, todo, audited = self.triage(srcimgs, metrics)
+        bboxes = self.model.detect_batch([srcimgs[i] for i in todo], metrics) if todo else []
+        return self.merge(srcimgs, results, todo, audited, bboxes)
+
+    def detect(self, srcimg):
+        return srcimg, self.detect_batch([srcimg])[0]
+
+    def check_audit(self, cheap, model):
+        self.audits += 1
+        agree = digits_of(cheap) == digits_of(model)
+        self.recent_audits.append(agree)
+        if agree:
+            self.agreements += 1
+        else:
+            logging.warning(f"Cascade audit mismatch: template {digits_of(cheap)}, model {digits_of(model)}")
+        if self.enabled and len(self.recent_audits) >= self.min_audits and self.agreement() < self.min_agreement:
+            self.enabled = False
+            logging.warning(f"Cascade disabled: audit agreement {self.agreement():.2%} "
+                            f"over the last {len(self.recent_audits)} audits")
+
+    def agreement(self):
+        """最近 audit_window 次抽查的一致率"""
+        return sum(self.recent_audits) / len(self.recent_audits) if self.recent_audits else 1.0
+
+    def stats(self):
+        return {'cascade_hits': self.hits, 'cascade_fallbacks': self.fallbacks,
+                'cascade_audits': self.audits, 'cascade_agreements': self.agreements}
+
+def cascade_audit_from_config(config):
+    """由 settings.ini 的 [CASCADE] 取得抽查比例，未啟用時回傳 None"""
+    if not config.getboolean('CASCADE', 'ENABLED', fallback=False):
+        return None
+    return config.getfloat('CASCADE', 'AUDIT', fallback=0.02)
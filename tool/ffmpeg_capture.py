@@ -0,0 +1,152 @@
+import os
+import logging
+import subprocess
+import cv2
+import numpy as np
+
+# 打包後 ffmpeg 不在 PATH 時，可用環境變數指定執行檔位置
+FFMPEG = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+class FFmpegROICapture():
+    """
+    以 ffmpeg 子程序解碼，只輸出 ROI：select (每 step 幀取一幀) -> crop -> bgr24 (起點為奇數時先轉 bgr24 再 crop)
+    介面與 cv2.VideoCapture 相同 (isOpened / grab / retrieve / read / get / set / release)，
+    但 retrieve 得到的是 ROI 大小的影像，不需要再 crop
+    每幀直接 readinto 預先配置的環狀緩衝區，不另外配置記憶體；
+    ring_size 需大於同時在處理中的幀數 (pipeline queue + batch)，否則舊的幀會被覆寫
+    """
+    def __init__(self, filepath, crop_xywh, step=1, ring_size=128, ffmpeg=FFMPEG):
+        self.filepath = filepath
+        self.crop_xywh = [int(v) for v in crop_xywh]
+        self.step = max(1, step)
+        self.ffmpeg = ffmpeg
+        # fps / 總幀數沿用 OpenCV 讀到的值，時間計算與 cv2.VideoCapture 相同
+        probe = cv2.VideoCapture(filepath)
+        self.opened = probe.isOpened()
+        self.fps = probe.get(cv2.CAP_PROP_FPS)
+        self.frame_count = probe.get(cv2.CAP_PROP_FRAME_COUNT)
+        probe.release()
+
+        _, _, w, h = self.crop_xywh
+        self.ring = np.empty((ring_size, h, w, 3), dtype=np.uint8)
+        self.slot = -1
+        self.pos = 0          # 下一幀的 index
+        self.grabbed = False  # 上一次 grab 是否有讀到 ffmpeg 輸出的幀
+        self.eof = False
+        self.proc = None
+        if self.opened:
+            self.start(0)
+
+    def command(self, start_index):
+        x, y, w, h = self.crop_xywh
+        filters = []
+        if self.step > 1:
+            # 與 FrameSampler.keep 相同：frame_count (index + 1) 為 step 的倍數時保留
+            filters.append(f"select=eq(mod(n+{start_index}\\,{self.step})\\,{self.step - 1})")
+        if x % 2 or y % 2:
+            # yuv420p 等色度次取樣的格式，crop 會把奇數的起點捨去成偶數 (exact=1 則色度錯位)，
+            # 先轉成 bgr24 再裁切，ROI 才與 OpenCV 解碼後裁切的像素相同
+            filters.append("format=bgr24")
+        filters.append(f"crop={w}:{h}:{x}:{y}")
+        cmd = [self.ffmpeg, '-nostdin', '-loglevel', 'error']
+        if start_index > 0 and self.fps > 0:
+            # 往前半幀，確保第一個輸出的就是 start_index 這一幀
+            cmd += ['-ss', f"{(start_index - 0.5) / self.fps:.6f}"]
+        cmd += ['-i', self.filepath, '-vf', ",".join(filters), '-vsync', 'passthrough',
+                '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+        return cmd
+
+    def start(self, start_index):
+        self.stop()
+        self.pos = start_index
+        self.grabbed = False
+        self.eof = False
+        self.proc = subprocess.Popen(self.command(start_index), stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, bufsize=self.ring[0].nbytes * 4)
+
+    def stop(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.stdout.close()
+            self.proc.wait()
+            self.proc = None
+
+    def read_into(self, frame):
+        view = memoryview(frame).cast('B')
+        filled = 0
+        while filled < len(view):
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        if self.proc is None or self.eof:
+            return False
+        keep = self.pos % self.step == self.step - 1
+        self.pos += 1
+        self.grabbed = False
+        if not keep:
+            # 沒被 select 的幀 ffmpeg 不會輸出，這裡只推進位置
+            return True
+        self.slot = (self.slot + 1) % len(self.ring)
+        if not self.read_into(self.ring[self.slot]):
+            self.eof = True
+            return False
+        self.grabbed = True
+        return True
+
+    def retrieve(self):
+        if not self.grabbed:
+            return False, None
+        return True, self.ring[self.slot]
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.pos
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.pos * 1000 / self.fps if self.fps > 0 else 0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.crop_xywh[2]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.crop_xywh[3]
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.start(int(value))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC and self.fps > 0:
+            self.start(int(round(value * self.fps / 1000)))
+            return True
+        return False
+
+    def release(self):
+        self.stop()
+        self.opened = False
+
+def open_capture(filepath, crop_xywh, decoder='opencv', step=1, ring_size=128):
+    """
+    回傳 (cap, frame_crop)：frame_crop 為對 cap 讀出的幀要再做的裁切
+    decoder='ffmpeg' 但找不到 ffmpeg 時改用 OpenCV
+    """
+    if decoder == 'ffmpeg':
+        try:
+            cap = FFmpegROICapture(filepath, crop_xywh, step=step, ring_size=ring_size)
+            return cap, (0, 0, crop_xywh[2], crop_xywh[3])
+        except FileNotFoundError:
+            logging.warning(f"ffmpeg not found ({FFMPEG}), falling back to OpenCV decoding")
+    return cv2.VideoCapture(filepath), crop_xywh
@@ -0,0 +1,54 @@
+import cv2
+
+
+class FrameSampler():
+    """包裝 cv2.VideoCapture，只對要保留的幀做解碼"""
+    def __init__(self, cap, step=3):
+        self.cap = cap
+        self.step = step
+        self.frames_read = 0
+
+    def keep(self, frame_count):
+        return frame_count % self.step == 0
+
+    def read(self, frame_count):
+        # 跳過的幀只 grab()，不做 decode / BGR 轉換
+        if not self.cap.grab():
+            return False, None
+        self.frames_read += 1
+        if not self.keep(frame_count):
+            return True, None
+        return self.cap.retrieve()
+
+    def seek_msec(self, msec):
+        self.cap.set(cv2.CAP_PROP_POS_MSEC, msec)
+        return int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    def seek_frame(self, frame_index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        return int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+    def sample_by_time(self, interval_msec, start_msec=0, max_failures=180):
+        # 稀疏取樣模式：依時間 seek，每 interval_msec 取一幀
+        # 回傳 (frame_count, pos_msec, frame)，frame_count 與 read() 相同由 1 開始 (index + 1)
+        msec = start_msec
+        failures = 0
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        total_frames = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration_msec = total_frames / fps * 1000 if fps > 0 and total_frames > 0 else None
+        while self.cap.isOpened():
+            if duration_msec is not None and msec >= duration_msec:
+                break
+            frame_count = self.seek_msec(msec) + 1
+            pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                if failures >= max_failures:
+                    break
+                msec += interval_msec
+                continue
+            failures = 0
+            self.frames_read += 1
+            yield frame_count, pos_msec, frame
+            msec += interval_msec
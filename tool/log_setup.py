@@ -0,0 +1,128 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+_worker_listener = None  # 把 worker process 的 log 寫進同一個檔案
+_worker_queue = None
+_lock = threading.Lock()
+
+def setup_logging(filename='process.log', level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=5, force=False):
+    """
+    log 先放進 queue，由背景執行緒 (QueueListener) 寫檔，處理流程不會被檔案 I/O 卡住
+    檔案超過 max_bytes 時輪替，保留 backup_count 份
+    重複呼叫不會重複設定，除非 force=True
+    """
+    global _listener, _worker_listener
+    with _lock:
+        if _listener is not None:
+            if not force:
+                return _listener
+            _listener.stop()
+            if _worker_listener is not None:
+                _worker_listener.stop()
+
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(level)
+
+        _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+        if _worker_queue is not None:
+            # 已交給 worker 的 queue 改寫進新的檔案
+            _worker_listener = QueueListener(_worker_queue, file_handler, respect_handler_level=True)
+            _worker_listener.start()
+        return _listener
+
+def worker_log_queue():
+    """
+    給 worker process (ProcessPoolExecutor 的 initargs) 的 multiprocessing queue，
+    主 process 的背景執行緒從這裡取出 worker 的 log，寫進 setup_logging 的同一個檔案 (輪替也只由主 process 進行)
+    尚未呼叫 setup_logging 時回傳 None
+    """
+    global _worker_listener, _worker_queue
+    with _lock:
+        if _listener is None:
+            return None
+        if _worker_queue is None:
+            _worker_queue = multiprocessing.Queue()
+            _worker_listener = QueueListener(_worker_queue, *_listener.handlers, respect_handler_level=True)
+            _worker_listener.start()
+        return _worker_queue
+
+def setup_worker_logging(log_queue, level=logging.INFO):
+    """
+    在 worker process 中呼叫：log 全部送進 worker_log_queue()，由主 process 寫檔，worker 不自行開檔
+    log_queue 為 None (主 process 沒有設定 log) 時維持原樣
+    """
+    global _listener, _worker_listener
+    if log_queue is None:
+        return
+    # fork 時繼承的 listener 在這個 process 中沒有執行緒，也不能在這裡停止 (會在共用的 queue 放入結束標記)
+    _listener = _worker_listener = None
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+def stop_logging():
+    global _listener, _worker_listener
+    with _lock:
+        # 先寫完 worker 送來的 log，再停止主 process 的 listener
+        if _worker_listener is not None:
+            _worker_listener.stop()
+            _worker_listener = None
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+atexit.register(stop_logging)
+
+class SummaryLogger():
+    """
+    每幀都會發生的訊息不逐筆寫入，只累計次數，
+    每 interval 秒輸出一筆摘要 (次數 + 最後一筆內容)
+    訊息以 % 格式與參數分開傳入，只有在輸出摘要時才格式化
+    """
+    def __init__(self, interval=10.0, logger=None):
+        self.interval = interval
+        self.logger = logger or logging.getLogger()
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> [次數, level, msg, args]
+        self.last_flush = time.monotonic()
+
+    def log(self, key, msg, *args, level=logging.INFO):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.entries[key] = [1, level, msg, args]
+            else:
+                entry[0] += 1
+                entry[2] = msg
+                entry[3] = args
+            due = time.monotonic() - self.last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            entries = self.entries
+            self.entries = {}
+            elapsed = time.monotonic() - self.last_flush
+            self.last_flush = time.monotonic()
+        for key, (count, level, msg, args) in entries.items():
+            if self.logger.isEnabledFor(level):
+                self.logger.log(level, f"[{key}] x{count} in {elapsed:.1f}s, last: {msg % args}")
@@ -0,0 +1,150 @@
+import csv
+import json
+import time
+import bisect
+import random
+import logging
+import threading
+import cProfile
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+# 直方圖的分界 (毫秒)
+HISTOGRAM_BOUNDS_MS = [0.01, 0.03, 0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000]
+# 每個階段最多保留幾筆計時用來估計百分位數
+RESERVOIR_SIZE = 4096
+
+class StageTiming():
+    """
+    一個階段的計時彙總，記憶體用量固定，與記錄次數無關：
+      次數 / 總和 / 最大值與固定分界的直方圖為精確值
+      百分位數由 reservoir sampling 保留的 reservoir_size 筆估計 (次數不超過 reservoir_size 時為精確值)
+    """
+    def __init__(self, reservoir_size=RESERVOIR_SIZE, seed=0):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.reservoir_size = reservoir_size
+        self.reservoir = []
+        self.random = random.Random(seed)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        # 第 i 格為 HISTOGRAM_BOUNDS_MS[i - 1] < ms <= HISTOGRAM_BOUNDS_MS[i]
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(ms)
+        else:
+            index = self.random.randrange(self.count)
+            if index < self.reservoir_size:
+                self.reservoir[index] = ms
+
+    def summary(self):
+        values = np.asarray(self.reservoir)
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.count,
+            'p50_ms': float(np.percentile(values, 50)),
+            'p90_ms': float(np.percentile(values, 90)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': self.max_ms,
+            'histogram': list(self.histogram),
+        }
+
+class StageMetrics():
+    """各階段的計時 (StageTiming) 與計數，可由多個執行緒同時記錄"""
+    def __init__(self, reservoir_size=RESERVOIR_SIZE):
+        self.timings = {}
+        self.counters = {}
+        self.reservoir_size = reservoir_size
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            timing = self.timings.get(stage)
+            if timing is None:
+                timing = self.timings[stage] = StageTiming(self.reservoir_size)
+            timing.add(seconds * 1000.0)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        with self.lock:
+            stages = {stage: timing.summary() for stage, timing in self.timings.items()}
+            counters = dict(self.counters)
+        return {'stages': stages, 'counters': counters, 'histogram_bounds_ms': HISTOGRAM_BOUNDS_MS}
+
+    def export(self, path_prefix):
+        """寫出 {path_prefix}.json 與 {path_prefix}.csv"""
+        summary = self.summary()
+        with open(f"{path_prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        fields = ['stage', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms']
+        with open(f"{path_prefix}.csv", "w", newline='', encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields + [f"<= {bound} ms" for bound in HISTOGRAM_BOUNDS_MS] + ["> 1000 ms"])
+            for stage, stats in summary['stages'].items():
+                writer.writerow([stage] + [stats[field] for field in fields[1:]] + stats['histogram'])
+            for name, value in summary['counters'].items():
+                writer.writerow([name, value])
+        logging.info(f"Metrics exported to {path_prefix}.json / .csv")
+        return summary
+
+class NullMetrics():
+    """未啟用量測時使用，不做任何記錄"""
+    def timer(self, stage):
+        return nullcontext()
+
+    def record(self, stage, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+NULL_METRICS = NullMetrics()
+
+@contextmanager
+def profiling(profiler, path_prefix):
+    """profiler 為 'cprofile'、'pyinstrument' 或 'none'"""
+    if profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(f"{path_prefix}.prof")
+            logging.info(f"cProfile stats written to {path_prefix}.prof")
+    elif profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logging.warning("pyinstrument is not installed, profiling disabled")
+            yield
+            return
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(f"{path_prefix}.html", "w", encoding="utf-8") as f:
+                f.write(profile.output_html())
+            logging.info(f"pyinstrument report written to {path_prefix}.html")
+    else:
+        yield
@@ -0,0 +1,59 @@
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_END = object()
+
+def run_pipeline(frames, preprocess, infer, batch_size=8, preprocess_workers=2, queue_size=64):
+    """
+    三段式串流處理：
+      reader thread   : 迭代 frames (解碼)，把前處理丟進 thread pool
+      thread pool     : preprocess(frame)
+      呼叫端 (consumer): 依原順序取回前處理結果，湊滿 batch_size 呼叫 infer(pending)
+    frame_queue 有上限，解碼太快時 reader 會被擋住，記憶體不會無限成長
+    """
+    frame_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=preprocess_workers) as pool:
+        def reader():
+            try:
+                for frame_count, date_str, frame in frames:
+                    if stop.is_set():
+                        break
+                    future = pool.submit(preprocess, frame)
+                    frame_queue.put((frame_count, date_str, future))
+            except Exception as e:
+                logging.error(f"Pipeline reader failed: {e}")
+                errors.append(e)
+            finally:
+                frame_queue.put(_END)
+
+        reader_thread = threading.Thread(target=reader, daemon=True)
+        reader_thread.start()
+
+        pending = []
+        try:
+            while True:
+                item = frame_queue.get()
+                if item is _END:
+                    break
+                frame_count, date_str, future = item
+                pending.append((frame_count, date_str, future.result()))
+                if len(pending) >= batch_size:
+                    infer(pending)
+            infer(pending)
+        finally:
+            # consumer 提前結束時，清空 queue 讓 reader 能結束
+            stop.set()
+            while reader_thread.is_alive():
+                try:
+                    frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            reader_thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,54 @@
+from .result_cache import cache_from_config
+from .checkpoint import checkpoint_interval_from_config
+from .digit_cascade import cascade_audit_from_config
+from .anomaly_recorder import anomaly_options_from_config
+from .roi_gate import gate_threshold_from_config
+from .utils import metrics_path_for, checkpoint_path_for, MODEL_PATH
+
+# GUI、cli 與多程序共用的處理選項，由 settings.ini (與命令列) 建立一次後整份傳遞
+# 除了 num_workers / metrics_enabled 之外，名稱與 process_video 的參數相同
+DEFAULT_OPTIONS = {
+    'num_workers': 1,             # 同時處理幾部影片
+    'shards': 1,                  # 一次處理一部影片時，每部影片切成幾段平行處理
+    'decoder': 'opencv',          # 'opencv' 或 'ffmpeg' (只解出 ROI)
+    'modelpath': MODEL_PATH,
+    'adaptive_sec': None,         # 自適應取樣的粗取樣間隔 (秒)，None 表示每個取樣點都推論
+    'gate_threshold': 20.0,       # ChangeGate 門檻，None 表示每個取樣點都送進模型
+    'cascade_audit': None,        # 樣板比對結果的抽查比例，None 表示不使用 cascade
+    'anomaly_options': None,      # 異常取樣存圖的設定，None 表示不存
+    'metrics_enabled': False,     # 輸出各階段計時 {檔名}_metrics.json / .csv
+    'profiler': 'none',
+    'cache': None,                # ResultCache，None 表示不使用快取
+    'checkpoint_interval': None,  # 進度檔寫入間隔 (秒)，None 表示不寫
+}
+
+def processing_options(**overrides):
+    """DEFAULT_OPTIONS 換上指定的值，名稱不在 DEFAULT_OPTIONS 中時丟出 TypeError"""
+    unknown = set(overrides) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise TypeError(f"unknown processing options: {sorted(unknown)}")
+    return dict(DEFAULT_OPTIONS, **overrides)
+
+def processing_options_from_config(config):
+    """由 settings.ini 的 [PROCESS] [MODEL] [METRICS] [CACHE] [CHECKPOINT] [CASCADE] [ANOMALY] 建立處理選項"""
+    return processing_options(
+        num_workers=config.getint('PROCESS', 'WORKERS', fallback=1),
+        shards=config.getint('PROCESS', 'SHARDS', fallback=1),
+        decoder=config.get('PROCESS', 'DECODER', fallback='opencv'),
+        modelpath=config.get('MODEL', 'PATH', fallback=None) or MODEL_PATH,
+        adaptive_sec=config.getfloat('PROCESS', 'ADAPTIVE_SEC', fallback=0) or None,
+        gate_threshold=gate_threshold_from_config(config),
+        cascade_audit=cascade_audit_from_config(config),
+        anomaly_options=anomaly_options_from_config(config),
+        metrics_enabled=config.getboolean('METRICS', 'ENABLED', fallback=False),
+        profiler=config.get('METRICS', 'PROFILER', fallback='none'),
+        cache=cache_from_config(config),
+        checkpoint_interval=checkpoint_interval_from_config(config),
+    )
+
+def video_kwargs(options, video_file):
+    """某部影片的 process_video 參數：metrics_enabled / checkpoint_interval 換成該影片的輸出與進度檔路徑"""
+    kwargs = {key: value for key, value in options.items() if key not in ('num_workers', 'metrics_enabled')}
+    kwargs['metrics_path'] = metrics_path_for(video_file) if options['metrics_enabled'] else None
+    kwargs['checkpoint_path'] = checkpoint_path_for(video_file) if options['checkpoint_interval'] is not None else None
+    return kwargs
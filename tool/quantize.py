@@ -0,0 +1,167 @@
+import os
+import sys
+import logging
+import argparse
+import tempfile
+import configparser
+import cv2
+import onnx
+from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from .yolov6_utils import LetterboxBuffer, roi_input_size, resize_roi
+
+DEFAULT_OUTPUT = "./onnx_model/yolov6s_int8.onnx"
+
+CALIBRATION_METHODS = {
+    'minmax': CalibrationMethod.MinMax,
+    'entropy': CalibrationMethod.Entropy,
+    'percentile': CalibrationMethod.Percentile,
+}
+
+def collect_calibration_crops(videos, crop_xywh, count=200):
+    """
+    從各影片平均取 count 張 ROI (複製一份，不保留整幀)
+    間隔的幀只 grab()，與 FrameSampler 相同不做 decode
+    """
+    crop_x, crop_y, crop_w, crop_h = crop_xywh
+    per_video = max(1, count // max(1, len(videos)))
+    crops = []
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        stride = max(1, total_frames // per_video)
+        taken = 0
+        frame_count = 0
+        while taken < per_video and cap.grab():
+            frame_count += 1
+            if frame_count % stride:
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            crops.append(frame[crop_y:crop_y + crop_h, crop_x:crop_x + crop_w].copy())
+            taken += 1
+        cap.release()
+        logging.info(f"Calibration crops from {video}: {taken}")
+    return crops
+
+def model_input(model):
+    """(名稱, [N, C, H, W])，動態維度為字串"""
+    tensor = model.graph.input[0]
+    dims = [d.dim_value if d.HasField('dim_value') else d.dim_param for d in tensor.type.tensor_type.shape.dim]
+    return tensor.name, dims
+
+def fix_input_size(model, input_size):
+    """
+    把動態的 H / W 固定為 input_size (縮小輸入的模型變體)
+    匯出時已固定尺寸的模型無法直接改，需以較小的 img-size 重新匯出
+    """
+    name, (_, _, height, width) = model_input(model)
+    dims = model.graph.input[0].type.tensor_type.shape.dim
+    for index, value in ((2, height), (3, width)):
+        if isinstance(value, int) and value > 0:
+            if value != input_size:
+                raise ValueError(f"input '{name}' has a fixed size {height}x{width}; "
+                                 f"re-export the model with img-size {input_size} instead")
+            continue
+        dims[index].Clear()
+        dims[index].dim_value = input_size
+    return model
+
+class CropCalibrationReader(CalibrationDataReader):
+    """以與推論相同的前處理 (縮放成 2:1 的 roi_input_size 後 letterbox) 校正用的 ROI，一次給一張"""
+    def __init__(self, crops, input_name, input_height, input_width):
+        self.crops = crops
+        self.input_name = input_name
+        self.buffer = LetterboxBuffer(input_height, input_width, max_batch=1)
+        self.roi_size = roi_input_size(input_height, input_width)
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.crops):
+            return None
+        self.buffer.fill(0, resize_roi(self.crops[self.index], self.roi_size))
+        self.index += 1
+        return {self.input_name: self.buffer.tensor[:1].copy()}
+
+    def rewind(self):
+        self.index = 0
+
+def quantize_model(src, dst, crops, input_size=None, per_channel=False, method='minmax',
+                   skip_preprocess=False, quantize=True):
+    """
+    以 crops 校正，產生靜態量化 (QDQ, uint8 activation / int8 weight) 的模型
+    input_size : 同時把動態 H / W 固定為較小的尺寸
+    quantize   : False 時只輸出固定尺寸的 FP32 模型
+    """
+    if quantize and not crops:
+        raise ValueError("no calibration crops")
+    model = onnx.load(src)
+    if input_size:
+        fix_input_size(model, input_size)
+    input_name, (_, _, height, width) = model_input(model)
+    height = height if isinstance(height, int) and height > 0 else 320
+    width = width if isinstance(width, int) and width > 0 else 320
+
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    if not quantize:
+        onnx.save(model, dst)
+        return dst
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixed = os.path.join(tmp, "fixed.onnx")
+        onnx.save(model, fixed)
+        prepared = fixed
+        if not skip_preprocess:
+            # 建議的前處理：shape inference 與 graph 最佳化，量化後的結果較穩定
+            # (symbolic shape inference 需要 sympy，卷積網路用 ONNX 本身的 shape inference 即可)
+            prepared = os.path.join(tmp, "prepared.onnx")
+            quant_pre_process(fixed, prepared, skip_symbolic_shape=True)
+        reader = CropCalibrationReader(crops, input_name, height, width)
+        quantize_static(prepared, dst, reader,
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=per_channel,
+                        calibrate_method=CALIBRATION_METHODS[method])
+    logging.info(f"Quantized model written: {dst} (calibrated on {len(crops)} crops)")
+    return dst
+
+def read_crop(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    return [config.getint('CROP', 'X', fallback=880),
+            config.getint('CROP', 'Y', fallback=240),
+            config.getint('CROP', 'W', fallback=120),
+            config.getint('CROP', 'H', fallback=60)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tool.quantize",
+                                     description="Build an INT8 (and optionally smaller input) model calibrated on our videos")
+    parser.add_argument('videos', nargs='*', help="videos to sample calibration crops from")
+    parser.add_argument('--model', default="./onnx_model/yolov6s.onnx", help="FP32 source model")
+    parser.add_argument('--out', default=DEFAULT_OUTPUT)
+    parser.add_argument('--settings', default='settings.ini')
+    parser.add_argument('--crop', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'),
+                        help="override the [CROP] section of the settings file")
+    parser.add_argument('--calib', type=int, default=200, help="number of calibration crops")
+    parser.add_argument('--input-size', type=int,
+                        help="fix a dynamic H/W input to this size (e.g. 256); fixed-size models must be re-exported")
+    parser.add_argument('--method', choices=sorted(CALIBRATION_METHODS), default='minmax')
+    parser.add_argument('--per-channel', action='store_true', help="per-channel weight quantization")
+    parser.add_argument('--skip-preprocess', action='store_true', help="skip quant_pre_process (shape inference)")
+    parser.add_argument('--fp32', action='store_true', help="only write the resized FP32 model, no quantization")
+    args = parser.parse_args(argv)
+    if not args.videos and not args.fp32:
+        parser.error("calibration needs at least one video")
+
+    crop_xywh = args.crop or read_crop(args.settings)
+    crops = [] if args.fp32 else collect_calibration_crops(args.videos, crop_xywh, args.calib)
+    quantize_model(args.model, args.out, crops, input_size=args.input_size, per_channel=args.per_channel,
+                   method=args.method, skip_preprocess=args.skip_preprocess, quantize=not args.fp32)
+    print(f"{args.model} -> {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import pandas as pd
+
+BLOCK_SIZE = 64 * 1024
+SAMPLE_BLOCKS = 8
+
+# 模型檔很大，同一個 (路徑, 大小, mtime) 只算一次 hash
+_model_hashes = {}
+_lock = threading.Lock()
+
+def file_fingerprint(filepath, block_size=BLOCK_SIZE, sample_blocks=SAMPLE_BLOCKS):
+    """大小 + mtime + 平均取樣幾個區塊的 hash，不需讀完整部影片"""
+    stat = os.stat(filepath)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(filepath, 'rb') as f:
+        if stat.st_size <= block_size * sample_blocks:
+            digest.update(f.read())
+        else:
+            step = (stat.st_size - block_size) // (sample_blocks - 1)
+            for i in range(sample_blocks):
+                f.seek(i * step)
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+def model_hash(modelpath):
+    stat = os.stat(modelpath)
+    key = (os.path.abspath(modelpath), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        cached = _model_hashes.get(key)
+    if cached is not None:
+        return cached
+    digest = hashlib.blake2b(digest_size=16)
+    with open(modelpath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    with _lock:
+        _model_hashes[key] = digest.hexdigest()
+    return _model_hashes[key]
+
+class ResultCache():
+    """
+    以內容為 key 的結果快取，每個 key 一個資料夾：
+      frames.pkl       每幀的預測 (frame, number, date)
+      measure_v{N}.pkl analyze_number_date 的結果，N 為分析規則的版本
+    只有分析規則改變時，沿用 frames.pkl 重跑分析即可
+    超過 max_bytes 時，依最後使用時間刪除最舊的項目 (LRU)
+    """
+    def __init__(self, cache_dir='./cache', max_bytes=1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, filepath, crop_xywh, modelpath, conf_threshold, nms_threshold, **params):
+        """params: 其他會影響每幀預測的設定，例如取樣間隔、gate 門檻"""
+        content = {
+            'video': file_fingerprint(filepath),
+            'crop': [int(v) for v in crop_xywh],
+            'model': model_hash(modelpath),
+            'conf': conf_threshold,
+            'nms': nms_threshold,
+            'params': params,
+        }
+        return hashlib.blake2b(json.dumps(content, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load_frames(self, key):
+        return self._load(key, "frames.pkl")
+
+    def load_measurements(self, key, analysis_version):
+        return self._load(key, f"measure_v{analysis_version}.pkl")
+
+    def save_frames(self, key, frames_df):
+        self._save(key, "frames.pkl", frames_df)
+
+    def save_measurements(self, key, analysis_version, measure_df):
+        self._save(key, f"measure_v{analysis_version}.pkl", measure_df)
+        self.evict()
+
+    def _load(self, key, name):
+        path = os.path.join(self.entry_dir(key), name)
+        try:
+            df = pd.read_pickle(path)
+        except (OSError, EOFError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logging.warning(f"Cache entry unreadable, ignoring: {path} ({e})")
+            return None
+        # 更新時間作為 LRU 的依據
+        try:
+            os.utime(self.entry_dir(key))
+        except OSError:
+            pass
+        return df
+
+    def _save(self, key, name, df):
+        entry = self.entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        path = os.path.join(entry, name)
+        # 先寫暫存檔再換名，多個 worker 同時寫入或中途中斷都不會留下半個檔案
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        os.utime(entry)
+
+    def entries(self):
+        """[(最後使用時間, 大小, 路徑), ...]"""
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry) if f.is_file())
+                result.append((os.stat(entry).st_mtime, size, entry))
+            except OSError:
+                continue
+        return result
+
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            logging.info(f"Evicting cache entry: {entry} ({size} bytes)")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+def cache_from_config(config):
+    """由 settings.ini 的 [CACHE] 建立快取，未啟用時回傳 None"""
+    if not config.getboolean('CACHE', 'ENABLED', fallback=False):
+        return None
+    return ResultCache(config.get('CACHE', 'DIR', fallback='./cache'),
+                       config.getint('CACHE', 'MAX_MB', fallback=1024) * 1024 * 1024)
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+
+class ChangeGate():
+    """
+    比對 ROI 與上一次真正推論的 ROI，變化不大時沿用上一次的預測
+    ROI 先轉灰階並縮小成 thumb_size，取逐像素差的最大值跟 threshold 比較
+    """
+    def __init__(self, threshold=20.0, thumb_size=(24, 12)):
+        self.threshold = threshold
+        self.thumb_size = thumb_size
+        self.reference = None
+        self.hits = 0    # 沿用上一次預測
+        self.misses = 0  # 需要送進模型
+
+    def thumbnail(self, roi):
+        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def check(self, roi):
+        """回傳 True 代表畫面沒變，可沿用上一次預測"""
+        thumb = self.thumbnail(roi)
+        if self.reference is not None and np.abs(thumb - self.reference).max() <= self.threshold:
+            self.hits += 1
+            return True
+        self.reference = thumb
+        self.misses += 1
+        return False
+
+    def stats(self):
+        return {'gate_hits': self.hits, 'gate_misses': self.misses}
+
+def gate_threshold_from_config(config, default=20.0):
+    """由 settings.ini 的 [PROCESS] gate_threshold 取得 ChangeGate 的門檻，0 或空白表示不使用 gate"""
+    value = config.get('PROCESS', 'GATE_THRESHOLD', fallback=str(default)).strip()
+    return (float(value) or None) if value else None
@@ -0,0 +1,67 @@
+import os
+import re
+
+# [CROP] 為主要的 ROI，其他 ROI 放在 [CROP:名稱] (例如同一個畫面中的第二台秤、皮重顯示)
+MAIN_ROI = 'main'
+ROI_SECTION_PREFIX = 'CROP:'
+DEFAULT_CROP = [880, 240, 120, 60]
+# 名稱會用在 CSV、進度檔與異常存圖的檔名中：只允許文字、數字、底線、- 與 . (不能以 . 開頭)
+ROI_NAME_PATTERN = re.compile(r'[\w-][\w.-]*')
+
+def check_roi_name(name):
+    """名稱不能當作檔名的一部分時 (例如含 / \\ : 或空白) 丟出 ValueError"""
+    if not ROI_NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"invalid ROI name {name!r}: use letters, digits, '_', '-' or '.'")
+    return name
+
+def read_crop_section(config, section, default=DEFAULT_CROP):
+    return [config.getint(section, 'X', fallback=default[0]),
+            config.getint(section, 'Y', fallback=default[1]),
+            config.getint(section, 'W', fallback=default[2]),
+            config.getint(section, 'H', fallback=default[3])]
+
+def rois_from_config(config):
+    """
+    回傳 {名稱: [x, y, w, h]}，第一個為 [CROP] (名稱取 [CROP] name，預設為 main)
+    名稱不能當作檔名時丟出 ValueError
+    """
+    rois = {check_roi_name(config.get('CROP', 'NAME', fallback=MAIN_ROI)): read_crop_section(config, 'CROP')}
+    for section in config.sections():
+        if section.startswith(ROI_SECTION_PREFIX):
+            rois[check_roi_name(section[len(ROI_SECTION_PREFIX):])] = read_crop_section(config, section)
+    return rois
+
+def rois_to_config(config, rois):
+    """把 {名稱: [x, y, w, h]} 寫回 config：第一個寫進 [CROP]，其餘寫進 [CROP:名稱]，刪掉已移除的 ROI"""
+    names = list(rois)
+    for section in config.sections():
+        if section.startswith(ROI_SECTION_PREFIX) and section[len(ROI_SECTION_PREFIX):] not in names[1:]:
+            config.remove_section(section)
+    for i, name in enumerate(names):
+        section = 'CROP' if i == 0 else ROI_SECTION_PREFIX + name
+        if not config.has_section(section):
+            config.add_section(section)
+        x, y, w, h = rois[name]
+        config[section]['X'], config[section]['Y'] = str(x), str(y)
+        config[section]['W'], config[section]['H'] = str(w), str(h)
+    if names and names[0] != MAIN_ROI:
+        config['CROP']['NAME'] = names[0]
+    elif config.has_option('CROP', 'NAME'):
+        config.remove_option('CROP', 'NAME')
+
+def union_box(crops):
+    """包含所有 ROI 的最小範圍，ffmpeg 只需輸出這個範圍"""
+    left = min(x for x, _, _, _ in crops)
+    top = min(y for _, y, _, _ in crops)
+    right = max(x + w for x, _, w, _ in crops)
+    bottom = max(y + h for _, y, _, h in crops)
+    return [left, top, right - left, bottom - top]
+
+def roi_path(path, name):
+    """'./a.dav.ckpt' -> './a.dav.tare.ckpt'，每個 ROI 各自一個檔案"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+def result_csv_name(filename, name=None):
+    """只有一個 ROI 時與原本相同：{檔名}_result.csv；多個 ROI 時為 {檔名}_{名稱}_result.csv"""
+    return f"{filename}_result.csv" if name is None else f"{filename}_{name}_result.csv"
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+def readings_to_float(values):
+    """float32 轉回 Python float 時取最短的十進位表示，12.3 不會變成 12.300000190734863"""
+    return np.asarray(values).astype(str).astype(np.float64).tolist()
+
+class SampleBuffer():
+    """
+    每幀預測的欄位式緩衝區，取代 list of dict：
+      frame  : int32 幀編號
+      number : float32 辨識出的數值
+      date   : int64 epoch 秒數，字串只在輸出測量結果時才格式化
+    容量不足時加倍，append 平均為 O(1)
+    """
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self.frame = np.empty(capacity, dtype=np.int32)
+        self.number = np.empty(capacity, dtype=np.float32)
+        self.date = np.empty(capacity, dtype=np.int64)
+        self.last = None  # 最後一筆 number 的原始值，避免 float32 轉回時多出位數
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, capacity):
+        if capacity <= len(self.frame):
+            return
+        capacity = max(capacity, 2 * len(self.frame))
+        for name in ('frame', 'number', 'date'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def append(self, frame, number, date):
+        if self.size == len(self.frame):
+            self.reserve(self.size + 1)
+        i = self.size
+        self.frame[i] = frame
+        self.number[i] = number
+        self.date[i] = date
+        self.size += 1
+        self.last = number
+
+    def extend(self, rows):
+        for frame, number, date in rows:
+            self.append(frame, number, date)
+
+    def extend_arrays(self, frame, number, date):
+        """一次加入整段欄位資料 (例如其他 process 處理完的一段影片)"""
+        n = len(frame)
+        if n == 0:
+            return
+        self.reserve(self.size + n)
+        self.frame[self.size:self.size + n] = frame
+        self.number[self.size:self.size + n] = number
+        self.date[self.size:self.size + n] = date
+        self.size += n
+        self.last = readings_to_float(number[-1:])[0]
+
+    def columns(self):
+        """(frame, number, date) 三個欄位的 view"""
+        return self.frame[:self.size], self.number[:self.size], self.date[:self.size]
+
+    def last_number(self):
+        return self.last
+
+    def to_dataframe(self):
+        # 各欄直接使用陣列的 view，不複製資料
+        frame, number, date = self.columns()
+        return pd.DataFrame({'frame': frame, 'number': number, 'date': date}, copy=False)
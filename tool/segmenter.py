@@ -0,0 +1,59 @@
+class MeasurementSegmenter():
+    """
+    analyze_number_date 的串流版本，一次輸入一筆 (frame, number, date)
+    規則相同：長度 > 30 的 0 值區段作為分隔；分隔出現時立即輸出前一段的測量結果
+    format_date : 輸出測量結果時轉換 date 的函數，例如 epoch 秒數轉字串
+    """
+    def __init__(self, on_measurement=None, format_date=None):
+        self.on_measurement = on_measurement
+        self.format_date = format_date
+        self.measurements = []   # [(測量, 數值, 時間), ...]
+        self.current_number = None
+        self.count = 0
+        self.last_date = None
+        self.group_stats = {}    # 數值 -> [總次數, 最大時間]
+        self.group_closed = False
+
+    def push(self, frame, number, date):
+        if self.count > 0 and number == self.current_number:
+            self.count += 1
+        else:
+            self.close_run()
+            self.current_number = number
+            self.count = 1
+            self.group_closed = False
+        self.last_date = date
+
+        # 0 值區段長度剛超過 30 時，前一段測量已結束
+        if self.current_number == 0.0 and self.count > 30 and not self.group_closed:
+            self.group_closed = True
+            return self.close_group()
+        return None
+
+    def close_run(self):
+        if self.count == 0:
+            return
+        if self.current_number >= 1.0:
+            stats = self.group_stats.setdefault(self.current_number, [0, self.last_date])
+            stats[0] += self.count
+            stats[1] = max(stats[1], self.last_date)
+        self.count = 0
+
+    def close_group(self):
+        candidates = [(number, count, date) for number, (count, date) in self.group_stats.items() if count > 30]
+        self.group_stats = {}
+        if not candidates:
+            return None
+        # 次數最多者；次數相同時取數值較小者
+        number, _, date = min(candidates, key=lambda item: (-item[1], item[0]))
+        if self.format_date is not None:
+            date = self.format_date(date)
+        measurement = (len(self.measurements) + 1, number, date)
+        self.measurements.append(measurement)
+        if self.on_measurement is not None:
+            self.on_measurement(measurement)
+        return measurement
+
+    def finish(self):
+        self.close_run()
+        return self.close_group()
@@ -0,0 +1,41 @@
+import os
+import logging
+import threading
+from .yolov6_utils import yolov6
+
+# 同一個 process 內共用的模型，key 為 (模型路徑, 檔案修改時間與大小, provider, 門檻值, session 設定)
+# 模型檔被換掉 (例如重新量化) 時 key 不同，會重新建立；同一路徑舊版本的 session 同時移除
+# InferenceSession.run 可同時由多個執行緒呼叫，yolov6 本身沒有會被修改的狀態
+_models = {}
+_lock = threading.Lock()
+
+def get_model(modelpath, confThreshold=0.5, nmsThreshold=0.5, intra_op_num_threads=0,
+              providers=('CPUExecutionProvider',), graph_optimization_level='all',
+              execution_mode='sequential', warmup=True):
+    path = os.path.abspath(modelpath)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, tuple(providers), confThreshold, nmsThreshold,
+           intra_op_num_threads, graph_optimization_level, execution_mode)
+    with _lock:
+        model = _models.get(key)
+    if model is not None:
+        return model
+
+    # 建立 session 與 warm-up 需要數秒，不佔住 lock，其他執行緒可同時取得已建立的模型
+    logging.info(f"Creating ONNX session: {key}")
+    model = yolov6(
+        modelpath,
+        confThreshold=confThreshold,
+        nmsThreshold=nmsThreshold,
+        intra_op_num_threads=intra_op_num_threads,
+        providers=providers,
+        graph_optimization_level=graph_optimization_level,
+        execution_mode=execution_mode
+    )
+    if warmup:
+        model.warmup()
+    with _lock:
+        for other in [other for other in _models if other[0] == path and other[1:3] != key[1:3]]:
+            del _models[other]
+        # 兩個執行緒同時建立同一個模型時，都使用先放進來的那一個
+        return _models.setdefault(key, model)
@@ -0,0 +1,36 @@
+import numpy as np
+
+# 輸出格式與原本的 time2str 相同：YYYY-MM-DD-HH:MM:SS
+DATE_FORMAT = "%Y-%m-%d-%H:%M:%S"
+
+def parse_start_time(time_string):
+    """檔名中的開始時間 'YYYYMMDDHHMMSS' -> epoch 秒數 (不做時區換算)"""
+    iso = (f"{time_string[:4]}-{time_string[4:6]}-{time_string[6:8]}"
+           f"T{time_string[8:10]}:{time_string[10:12]}:{time_string[12:14]}")
+    return int(np.datetime64(iso, 's').astype(np.int64))
+
+def format_timestamps(timestamps):
+    """epoch 秒數陣列 -> 字串陣列，一次轉換整個陣列"""
+    iso = np.datetime_as_string(np.asarray(timestamps, dtype=np.int64).astype('datetime64[s]'), unit='s')
+    return np.char.replace(iso, 'T', '-')
+
+def format_timestamp(timestamp):
+    return str(format_timestamps([timestamp])[0])
+
+class FrameClock():
+    """
+    由檔名的開始時間加上影片位置推算每一幀的時間 (epoch 秒數)：
+      幀編號 frame_count (由 1 開始) 的時間 = 開始時間 + (frame_count - 1) / fps
+    fps 使用實際的浮點數 (29.97、12.5 ...)，不會因為取整數而累積誤差
+    影片沒有提供 fps 時，改用 CAP_PROP_POS_MSEC
+    """
+    def __init__(self, start, fps):
+        self.start = start
+        self.fps = fps if fps and fps > 0 else None
+
+    def at_frame(self, frame_count):
+        # 加上極小值，避免 29.97 這類 fps 在整秒邊界因浮點誤差少算一秒
+        return self.start + int((frame_count - 1) / self.fps + 1e-9)
+
+    def at_msec(self, pos_msec):
+        return self.start + int(pos_msec // 1000)
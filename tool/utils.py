@@ -1,15 +1,41 @@
+import os
 import cv2
+import numpy as np
 import pandas as pd
 import time
 import logging
-from .yolov6_utils import yolov6
+from .session_pool import get_model
+from .yolov6_utils import resize_roi, ROI_SIZE
+from .frame_sampler import FrameSampler
+from .pipeline import run_pipeline
+from .roi_gate import ChangeGate
+from .segmenter import MeasurementSegmenter
+from .adaptive_sampler import AdaptiveSampler
+from .digit_cascade import DigitCascade
+from .anomaly_recorder import AnomalyRecorder
+from .metrics import StageMetrics, NULL_METRICS, profiling
+from .log_setup import SummaryLogger
+from .checkpoint import Checkpoint
+from .result_cache import file_fingerprint
+from .sample_buffer import SampleBuffer, readings_to_float
+from .ffmpeg_capture import open_capture
+from .rois import union_box, roi_path
+from .timestamps import FrameClock, parse_start_time, format_timestamps, format_timestamp
 
-# Setup logging
-logging.basicConfig(filename='process.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+MODEL_PATH = "./onnx_model/yolov6s.onnx"
+CONF_THRESHOLD = 0.7
+NMS_THRESHOLD = 0.5
+# analyze_number_date / segment_measurements 的規則改變時要加 1，快取的測量結果才會重新計算
+ANALYSIS_VERSION = 1
+# 每幀資料 (取樣、時間的計算方式) 改變時要加 1，快取與進度檔中舊的每幀資料才不會被沿用
+FRAME_DATA_VERSION = 3
+
+# 每幀的訊息只做彙總，定期寫一筆摘要
+frame_log = SummaryLogger()
 
 def crop_image(image, x, y, w, h):
     """裁剪图像并更新 YOLO 标签"""
-    logging.info(f"Cropping image at coordinates: x={x}, y={y}, w={w}, h={h}")
+    frame_log.log('crop', "Cropping image at coordinates: x=%s, y=%s, w=%s, h=%s", x, y, w, h)
     return image[y:y+h, x:x+w]
 
 def convert_to_number(data):
@@ -23,94 +49,109 @@ def convert_to_number(data):
         else:
             number *= 10
 
-    logging.info(f"Converted prediction data to number: {number}")
+    frame_log.log('convert', "Converted prediction data to number: %s", number)
     return number
 
-def process_frame(frame, model_local, crop_xywh):
+def model_roi_size(model_local):
+    # yolov6 的 ROI 縮放大小；沒有此屬性的模型 (例如測試用的替身) 沿用原本的 240x120 (ROI_SIZE)
+    return getattr(model_local, 'roi_size', ROI_SIZE)
+
+def prepare_frame(frame, crop_xywh, roi_size=None):
+    # ROI 直接縮放成模型輸入中 2:1 區域的大小 (在前處理執行緒完成)，LetterboxBuffer 只需複製與正規化
+    # 縮放後是新的陣列，排在 pipeline queue 中時不會留住整張畫面
     crop_x, crop_y, crop_w, crop_h = crop_xywh
-    # logging.info(f"Processing frame with crop coordinates: x={crop_x}, y={crop_y}, w={crop_w}, h={crop_h}")
-    processed_frame = crop_image(frame, crop_x, crop_y, crop_w, crop_h)
-    processed_frame = cv2.resize(processed_frame, (240, 120))
-    _, prediction = model_local.detect(processed_frame)
+    roi = crop_image(frame, crop_x, crop_y, crop_w, crop_h)
+    return resize_roi(roi, roi_size or ROI_SIZE)
 
+def prediction_to_number(prediction):
     number = 0
     if len(prediction) > 0:
         number = convert_to_number(prediction)
         if number <= 1.0:
             number = 0.0
     else:
-        logging.error(f"convert : error, {prediction}")
+        frame_log.log('convert_error', "convert : error, %s", prediction, level=logging.ERROR)
         number = -1
 
-    logging.info(f"Frame processed, detected number: {number}")
+    frame_log.log('frame', "Frame processed, detected number: %s", number)
     return number
 
-def parse_time_string(time_string):
-    year = int(time_string[:4])
-    month = int(time_string[4:6])
-    day = int(time_string[6:8])
-    hour = int(time_string[8:10])
-    minute = int(time_string[10:12])
-    second = int(time_string[12:14])
-    return year, month, day, hour, minute, second
-
-def increment_time(year, month, day, hour, minute, second):
-    second += 1
-    if second >= 60:
-        second = 0
-        minute += 1
-    if minute >= 60:
-        minute = 0
-        hour += 1
-    if hour >= 24:
-        hour = 0
-        day += 1
-    if day > 31:
-        day = 1
-        month += 1
-    if month > 12:
-        month = 1
-        year += 1
-    return year, month, day, hour, minute, second
-
-def time2str(year, month, day, hour, minute, second):
-    str_month = f"0{month}" if month < 10 else str(month)
-    str_day = f"0{day}" if day < 10 else str(day)
-    str_hour = f"0{hour}" if hour < 10 else str(hour)
-    str_minute = f"0{minute}" if minute < 10 else str(minute)
-    str_second = f"0{second}" if second < 10 else str(second)
-    return f"{year}-{str_month}-{str_day}-{str_hour}:{str_minute}:{str_second}"
+def process_frame(frame, model_local, crop_xywh):
+    # model_local 可以是 DigitCascade：先用樣板比對，不確定時才交給 yolov6
+    processed_frame = prepare_frame(frame, crop_xywh, model_roi_size(model_local))
+    _, prediction = model_local.detect(processed_frame)
+    return prediction_to_number(prediction)
+
+def process_batch(processed_frames, model_local, metrics=NULL_METRICS):
+    predictions = model_local.detect_batch(processed_frames, metrics)
+    with metrics.timer('convert_to_number'):
+        return [prediction_to_number(prediction) for prediction in predictions]
+
+def run_length_encode(numbers):
+    """回傳每一段連續相同數值的 (value, count, start, end)，end 為該段最後一筆的 index"""
+    numbers = np.asarray(numbers)
+    if numbers.dtype != np.float32:
+        numbers = numbers.astype(np.float64)
+    n = len(numbers)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return numbers, empty, empty, empty
+    change = np.empty(n, dtype=bool)
+    change[0] = True
+    np.not_equal(numbers[1:], numbers[:-1], out=change[1:])
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], n) - 1
+    return numbers[starts], ends - starts + 1, starts, ends
+
+def segment_measurements(values, counts, dates):
+    """
+    由 run-length 結果切出每次測量：
+      1. 長度 > 30 的 0 值區段作為分隔，切成多個 group
+      2. 每個 group 中，同一數值 (>= 1.0) 的總次數需 > 30
+      3. 取總次數最多的數值 (同次數取較小的數值)，時間為該數值最後出現的時間
+    回傳 [(數值, 時間), ...]
+    """
+    groups = np.cumsum((values == 0.0) & (counts > 30))
+
+    candidate = values >= 1.0
+    groups, values, counts, dates = groups[candidate], values[candidate], counts[candidate], dates[candidate]
+    if len(values) == 0:
+        return []
+
+    # 依 (group, 數值, 時間) 排序，同一個 (group, 數值) 的最後一筆即為最大時間
+    order = np.lexsort((dates, values, groups))
+    groups, values, counts, dates = groups[order], values[order], counts[order], dates[order]
+    key_start = np.flatnonzero(np.r_[True, (groups[1:] != groups[:-1]) | (values[1:] != values[:-1])])
+    key_end = np.append(key_start[1:], len(values)) - 1
+    key_groups = groups[key_start]
+    key_values = values[key_start]
+    key_counts = np.add.reduceat(counts, key_start)
+    key_dates = dates[key_end]
+
+    valid = key_counts > 30
+    key_groups, key_values, key_counts, key_dates = key_groups[valid], key_values[valid], key_counts[valid], key_dates[valid]
+    if len(key_values) == 0:
+        return []
+
+    # 每個 group 取次數最多者；次數相同時取數值較小者
+    order = np.lexsort((key_values, -key_counts, key_groups))
+    first = np.r_[True, key_groups[order][1:] != key_groups[order][:-1]]
+    best = order[first]
+    return list(zip(readings_to_float(key_values[best]), key_dates[best].tolist()))
 
 def analyze_number_date(df):
-    result = []
-    current_number = None
-    count = 0
-    for i, row in df.iterrows():
-        if row['number'] == current_number:
-            count += 1
-        else:
-            if current_number is not None:
-                result.append([current_number, count, previous_date])
-            current_number = row['number']
-            count = 1
-        previous_date = row['date']
-    result.append([current_number, count, previous_date])
-    result_df = pd.DataFrame(result, columns=['number', 'count', 'date'])
-    condition = (result_df['number'] == 0.0) & (result_df['count'] > 30)
-    result_df['group'] = condition.cumsum()
-    subsequences = [sub_df for _, sub_df in result_df.groupby('group') if not (sub_df['number'].nunique() == 1 and sub_df['number'].iloc[0] == 0.0)]
-    results = []
-    measure_count = 1
-    for i, subsequence in enumerate(subsequences):
-        grouped_df = subsequence.groupby(['number', 'group']).agg(
-            count=('count', 'sum'),
-            date=('date', 'max')
-        ).reset_index()
-        filtered_subseq = grouped_df[(grouped_df['number'] >= 1.0) & (grouped_df['count'] > 30)]
-        if not filtered_subseq.empty:
-            max_row = filtered_subseq.loc[filtered_subseq['count'].idxmax()]
-            results.append((measure_count, max_row['number'], max_row['date']))
-            measure_count += 1
+    if len(df) == 0:
+        return pd.DataFrame([], columns=["測量", "數值", "時間"])
+    values, counts, _, ends = run_length_encode(df['number'].to_numpy())
+    dates = df['date'].to_numpy()[ends]
+    # date 為 epoch 秒數時直接以整數比較，只有輸出的幾筆才轉成字串
+    epoch_dates = np.issubdtype(dates.dtype, np.integer)
+    dates = dates if epoch_dates else np.asarray(dates, dtype=str)
+    measurements = segment_measurements(values, counts, dates)
+    if epoch_dates and measurements:
+        measurements = list(zip([number for number, _ in measurements],
+                                format_timestamps([date for _, date in measurements]).tolist()))
+    results = [(measure_count, number, date) for measure_count, (number, date) in enumerate(measurements, start=1)]
     df_max_values = pd.DataFrame(results, columns=["測量", "數值", "時間"])
     return df_max_values
 
@@ -123,34 +164,104 @@ def merge_duplicates(sequence):
             merged_sequence[value] = count
     return list(merged_sequence.items())
 
-def process_video(filepath, crop_xywh):
-    logging.info(f"Starting video processing for file: {filepath}")
-    cap = cv2.VideoCapture(filepath)
-    model_local = yolov6(
-        "./onnx_model/yolov6s.onnx",
-        confThreshold=0.7,
-        nmsThreshold=0.5
-    )
+def metrics_path_for(filepath):
+    # 與結果 CSV 放在同一個位置：./{檔名}_metrics.json / .csv
+    return os.path.join(".", f"{os.path.basename(filepath)}_metrics")
+
+def checkpoint_path_for(filepath):
+    # 與結果 CSV 放在同一個位置：./{檔名}.ckpt
+    return os.path.join(".", f"{os.path.basename(filepath)}.ckpt")
+
+def flush_batch(pending, model_local, datas, gates, cascades, metrics=NULL_METRICS, recorder=None, names=None):
+    """
+    推論 pending 並加進 datas，回傳每個 ROI 新增的 [(frame, number, date), ...]
+    pending  : [(frame_count, timestamp, (roi_0, roi_1, ...)), ...]，datas / gates / cascades 與 ROI 一一對應
+    各 ROI 先各自經過 gate / cascade，剩下要推論的 ROI (不分是哪一個) 合成一次 detect_batch
+    recorder : AnomalyRecorder，推論結果異常時把 ROI 交給它在背景存檔，以 names[k] 標示是哪一個 ROI
+    """
+    if not pending:
+        return [[] for _ in datas]
+    names = names or [None] * len(datas)
+    staged = []
+    batch = []
+    for k, (gate, cascade) in enumerate(zip(gates, cascades)):
+        rois = [item[2][k] for item in pending]
+        # 畫面沒變的幀 (gate 命中) 不送進模型，沿用前一筆的預測
+        with metrics.timer('gate'):
+            reuse = [gate is not None and gate.check(roi) for roi in rois]
+        images = [roi for roi, skip in zip(rois, reuse) if not skip]
+        if cascade is not None:
+            results, todo, audited = cascade.triage(images, metrics)
+        else:
+            results, todo, audited = [None] * len(images), list(range(len(images))), {}
+        staged.append((reuse, images, results, todo, audited, len(batch)))
+        batch.extend(images[i] for i in todo)
+
+    bboxes = model_local.detect_batch(batch, metrics) if batch else []
+
+    rows_by_roi = []
+    for k, ((reuse, images, results, todo, audited, offset), data, cascade) in enumerate(zip(staged, datas, cascades)):
+        model_bboxes = bboxes[offset:offset + len(todo)]
+        if cascade is not None:
+            predictions = cascade.merge(images, results, todo, audited, model_bboxes)
+        else:
+            predictions = model_bboxes
+        with metrics.timer('convert_to_number'):
+            numbers = [prediction_to_number(prediction) for prediction in predictions]
+        if recorder is not None:
+            inferred = [item for item, skip in zip(pending, reuse) if not skip]
+            with metrics.timer('anomaly_check'):
+                for (frame_count, timestamp, _), roi, prediction, number in zip(inferred, images, predictions, numbers):
+                    recorder.check(frame_count, timestamp, roi, prediction, number, names[k])
+        numbers = iter(numbers)
+        rows = []
+        for (frame_count, timestamp, _), skip in zip(pending, reuse):
+            detect_number = data.last_number() if skip else next(numbers)
+            data.append(frame_count, detect_number, timestamp)
+            rows.append((frame_count, detect_number, timestamp))
+        rows_by_roi.append(rows)
+    pending.clear()
+    return rows_by_roi
+
+def iter_sampled_frames(cap, sampler, date, sample_interval_msec=None, metrics=NULL_METRICS, start_frame=1, end_frame=None):
+    """
+    解碼並產生要推論的幀：(frame_count, timestamp, frame)，timestamp 為 epoch 秒數
+    start_frame / end_frame : 只處理 start_frame <= frame_count < end_frame 的幀 (end_frame 為 None 時到影片結尾)
+                              用於中斷後繼續處理，以及把一部影片切成多段平行處理
+    """
+    clock = FrameClock(parse_start_time(date), cap.get(cv2.CAP_PROP_FPS))
+
+    if sample_interval_msec is not None:
+        # 稀疏取樣：依 CAP_PROP_POS_MSEC 跳躍；時間與逐幀取樣相同由幀編號推算 (seek 後的 POS_MSEC 為前一幀的位置)
+        start_msec = 0
+        if start_frame > 1 and clock.fps:
+            # 從 start_frame 之前 (或剛好在 start_frame) 的取樣時間開始，已處理的幀在下面略過
+            start_msec = int((start_frame - 1) * 1000 / clock.fps // sample_interval_msec) * sample_interval_msec
+        for frame_count, pos_msec, frame in sampler.sample_by_time(sample_interval_msec, start_msec):
+            if frame_count < start_frame:
+                continue
+            if end_frame is not None and frame_count >= end_frame:
+                break
+            yield frame_count, clock.at_frame(frame_count) if clock.fps else clock.at_msec(pos_msec), frame
+        return
 
-    data = []
     frame_count = 1
-    filename = filepath.split("\\")[-1]
-    date = filename.split("_")[3]
-    year, month, day, hour, minute, second = parse_time_string(date)
     no_frame_count = 0
+    if clock.fps is None:
+        logging.warning("Video has no FPS information, timestamps use CAP_PROP_POS_MSEC")
+    if start_frame > 1:
+        # frame_count 由 1 開始，index 為 frame_count - 1
+        sampler.seek_frame(start_frame - 1)
+        frame_count = start_frame
 
-    frame_num = int(cap.get(cv2.CAP_PROP_FPS))
-
-    start = time.time()
     while cap.isOpened():
-        if frame_count % frame_num == 0:
-            year, month, day, hour, minute, second = increment_time(year, month, day, hour, minute, second)
-
-        ret, frame = cap.read()
+        if end_frame is not None and frame_count >= end_frame:
+            break
+        with metrics.timer('decode'):
+            ret, frame = sampler.read(frame_count)
         if not ret:
             no_frame_count += 1
-            date_str = time2str(year, month, day, hour, minute, second)
-            logging.warning(f"time: {date_str}, frame: {frame_count}, No frame read!")
+            frame_log.log('no_frame', "frame: %s, No frame read!", frame_count, level=logging.WARNING)
 
             if no_frame_count == 180:
                 logging.error("Failed to read frame multiple times, stopping video processing")
@@ -158,23 +269,322 @@ def process_video(filepath, crop_xywh):
 
             continue
 
-        if frame_count % 3 == 0:
-            detect_number = process_frame(frame, model_local, crop_xywh)
-            date_str = time2str(year, month, day, hour, minute, second)
-            frame_data = {
-                'frame': frame_count,
-                'number': detect_number,
-                'date': date_str
-            }
-            data.append(frame_data)
+        if sampler.keep(frame_count):
+            timestamp = clock.at_frame(frame_count) if clock.fps else clock.at_msec(cap.get(cv2.CAP_PROP_POS_MSEC))
+            yield frame_count, timestamp, frame
 
         frame_count += 1
 
-    cap.release()
-    end = time.time()
+def sample_video(cap, date, crops, model_local, datas, emit=None, batch_size=8, sample_step=3,
+                 sample_interval_msec=None, pipeline_workers=2, queue_size=64, gate_threshold=20.0,
+                 adaptive_sec=None, cascade_audit=None, start_frame=1, end_frame=None, metrics=NULL_METRICS,
+                 recorder=None, names=None):
+    """
+    解碼 -> 前處理 -> 推論：每個取樣幀切出 crops 中的各個 ROI，第 k 個 ROI 的結果依順序加進 datas[k] (SampleBuffer)
+    emit(rows_by_roi) : 每次新增時呼叫，rows_by_roi[k] 為第 k 個 ROI 新增的 [(frame, number, timestamp), ...]
+    cascade_audit     : 指定時先經過 DigitCascade，確定的結果中抽 cascade_audit 比例送進模型比對
+    adaptive_sec      : 只支援一個 ROI (各 ROI 細分的位置不同，無法合成同一批推論)
+    recorder / names  : AnomalyRecorder 與各 ROI 的名稱 (自適應取樣時不使用)
+    回傳統計 (各 ROI 加總)：frames_read / gate_hits / gate_misses / inferred / cascade_*
+    """
+    if adaptive_sec is not None and len(crops) != 1:
+        raise ValueError("adaptive sampling supports a single ROI")
+    sampler = FrameSampler(cap, step=sample_step)
+    frames = iter_sampled_frames(cap, sampler, date, sample_interval_msec, metrics, start_frame, end_frame)
+    gates = [ChangeGate(gate_threshold) if gate_threshold is not None and adaptive_sec is None else None
+             for _ in crops]
+    cascades = [DigitCascade(model_local, audit_fraction=cascade_audit) if cascade_audit is not None else None
+                for _ in crops]
+    adaptive = None
+    if adaptive_sec is not None:
+        detector = cascades[0] if cascades[0] is not None else model_local
+        samples_per_sec = 1000 / sample_interval_msec if sample_interval_msec else cap.get(cv2.CAP_PROP_FPS) / sample_step
+        adaptive = AdaptiveSampler(lambda rois: process_batch(rois, detector, metrics),
+                                   coarse_step=round(adaptive_sec * samples_per_sec), batch_size=batch_size)
+    emit = emit if emit is not None else (lambda rows_by_roi: None)
+    sampled_before = sum(len(data) for data in datas)
+    roi_size = model_roi_size(model_local)
+
+    def preprocess(frame):
+        with metrics.timer('crop'):
+            return tuple(prepare_frame(frame, crop, roi_size) for crop in crops)
+
+    def emit_adaptive(rows):
+        for row in rows:
+            datas[0].append(*row)
+        emit([rows])
+
+    def infer(pending):
+        if adaptive is None:
+            emit(flush_batch(pending, model_local, datas, gates, cascades, metrics, recorder, names))
+            return
+        for frame_count, timestamp, (roi,) in pending:
+            emit_adaptive(adaptive.push(frame_count, timestamp, roi))
+        pending.clear()
+
+    if pipeline_workers > 0:
+        # 解碼 / 前處理 / 推論 分成不同執行緒同時進行
+        run_pipeline(frames, preprocess, infer, batch_size=batch_size,
+                     preprocess_workers=pipeline_workers, queue_size=queue_size)
+    else:
+        pending = []  # (frame_count, timestamp, rois)，湊滿 batch_size 再一起推論
+        for frame_count, timestamp, frame in frames:
+            pending.append((frame_count, timestamp, preprocess(frame)))
+            if len(pending) >= batch_size:
+                infer(pending)
+        infer(pending)
+    if adaptive is not None:
+        emit_adaptive(adaptive.finish())
 
-    logging.info(f"Video processing completed for file: {filepath}. Total frames: {frame_count}, Processing time: {end - start} seconds")
+    stats = {'frames_read': sampler.frames_read}
+    stats['inferred'] = adaptive.inferred if adaptive is not None else sum(len(data) for data in datas) - sampled_before
+    for gate in gates:
+        if gate is not None:
+            # 沿用上一次預測的幀沒有經過模型
+            stats['inferred'] -= gate.hits
+            for key, value in gate.stats().items():
+                stats[key] = stats.get(key, 0) + value
+    for cascade in cascades:
+        if cascade is not None:
+            # 由樣板比對回答的幀沒有經過模型
+            stats['inferred'] -= cascade.hits
+            for key, value in cascade.stats().items():
+                stats[key] = stats.get(key, 0) + value
+    return stats
 
-    df = pd.DataFrame(data)
-    measure_df = analyze_number_date(df)
+def capture_ring_size(batch_size, queue_size, pipeline_workers):
+    # FFmpegROICapture 的環狀緩衝區要大於同時在處理中的幀數：queue + 湊批次中的幀 + 前處理中的幀
+    return queue_size + 2 * batch_size + pipeline_workers + 2
+
+def video_start_time(filepath):
+    # DVR 檔名的第 4 欄為錄影開始時間，例如 NVR_ch2_main_20240101080000_20240101090000.dav
+    return os.path.basename(filepath).split("_")[3]
+
+def result_cache_key(cache, filepath, crop_xywh, modelpath, sample_step, sample_interval_msec, gate_threshold,
+                     adaptive_sec, cascade_audit, decoder, shards):
+    # 時間欄位由檔名的開始時間推算，內容相同但檔名不同的影片不能共用快取
+    # 兩種解碼器的裁切與色彩轉換不同，切段時 gate / 取樣狀態在每段開頭重新開始，讀值都可能不同
+    return cache.make_key(filepath, crop_xywh, modelpath, CONF_THRESHOLD, NMS_THRESHOLD,
+                          start_time=video_start_time(filepath), sample_step=sample_step,
+                          sample_interval_msec=sample_interval_msec,
+                          gate_threshold=gate_threshold, adaptive_sec=adaptive_sec,
+                          cascade_audit=cascade_audit, decoder=decoder, shards=shards,
+                          frame_data_version=FRAME_DATA_VERSION)
+
+def checkpoint_header(filepath, crop_xywh, modelpath, sample_step, sample_interval_msec, gate_threshold,
+                      adaptive_sec, cascade_audit, decoder, shards):
+    # 任何一項不同，進度檔就作廢
+    return {
+        'video': file_fingerprint(filepath), 'start_time': video_start_time(filepath),
+        'crop': [int(v) for v in crop_xywh],
+        'model': modelpath, 'conf': CONF_THRESHOLD, 'nms': NMS_THRESHOLD,
+        'sample_step': sample_step, 'sample_interval_msec': sample_interval_msec,
+        'gate_threshold': gate_threshold, 'adaptive_sec': adaptive_sec, 'cascade_audit': cascade_audit,
+        'decoder': decoder, 'shards': shards,
+        'frame_data_version': FRAME_DATA_VERSION,
+    }
+
+def load_cached_result(cache, cache_key, filepath):
+    """快取中有測量結果就直接回傳；只有每幀預測時重跑 analyze_number_date；都沒有回傳 None"""
+    measure_df = cache.load_measurements(cache_key, ANALYSIS_VERSION)
+    if measure_df is not None:
+        logging.info(f"Cache hit for file: {filepath}")
+        return measure_df
+    frames_df = cache.load_frames(cache_key)
+    if frames_df is None:
+        return None
+    logging.info(f"Cache hit (frames only) for file: {filepath}, re-running analysis")
+    measure_df = analyze_number_date(frames_df)
+    cache.save_measurements(cache_key, ANALYSIS_VERSION, measure_df)
     return measure_df
+
+def process_video(filepath, crop_xywh, batch_size=8, sample_step=3, sample_interval_msec=None, model_local=None,
+                  pipeline_workers=2, queue_size=64, gate_threshold=20.0, on_measurement=None,
+                  metrics_path=None, profiler='none', cache=None, checkpoint_path=None, checkpoint_interval=60.0,
+                  adaptive_sec=None, shards=1, decoder='opencv', modelpath=MODEL_PATH, cascade_audit=None,
+                  anomaly_options=None):
+    """
+    crop_xywh       : [x, y, w, h]，回傳 measure_df；
+                      或 {名稱: [x, y, w, h]} 一次解碼、讀多個 ROI，回傳 {名稱: measure_df}
+                      (每個取樣幀的所有 ROI 合成同一批推論；每個 ROI 的每幀資料、快取都與單獨處理該 ROI 相同)
+    on_measurement  : 切出一筆測量結果時呼叫 on_measurement(row)；多個 ROI 時為 on_measurement(名稱, row)
+    metrics_path    : 指定時，各階段計時輸出成 {metrics_path}.json / .csv
+    profiler        : 'cprofile' / 'pyinstrument' 時另外輸出 profile 結果 (需同時指定 metrics_path)
+    cache           : ResultCache，影片 / 裁切範圍 / 模型 / 門檻值都相同時直接沿用上次的結果
+    checkpoint_path : 指定時，每 checkpoint_interval 秒把進度寫進這個檔案；
+                      中斷後再處理同一部影片會從上次的進度繼續，處理完成後刪除
+                      多個 ROI 時每個 ROI 各自一個進度檔 ({檔名}.{名稱}.ckpt)
+    adaptive_sec    : 指定時改用 AdaptiveSampler，畫面穩定時約每 adaptive_sec 秒才推論一次
+                      (此時不使用 ChangeGate)
+    shards          : > 1 時把影片依幀數切成 shards 段，各段由不同 process 處理 (不使用 model_local)
+                      ChangeGate / AdaptiveSampler 在每段開頭重新開始，兩者都不使用時結果才保證與依序處理相同
+                      (使用 gate 時每段第一個取樣一定推論，不會沿用前一段的預測)；時間取樣模式不切段
+                      多個 ROI 時不使用 adaptive_sec 與 shards
+    decoder         : 'ffmpeg' 時由 ffmpeg 只輸出 ROI (多個 ROI 時為包含所有 ROI 的範圍)；時間取樣模式固定使用 OpenCV
+    modelpath       : ONNX 模型 (例如 tool.quantize 產生的 INT8 版本)；指定 model_local 時需與其一致
+    cascade_audit   : 指定時先用 DigitCascade 樣板比對，不確定的幀才送進模型；
+                      確定的結果另外抽 cascade_audit 比例 (例如 0.02) 送進模型比對一致率
+    anomaly_options : 指定時 ({'out_dir': ..., 'low_conf': ..., 'max_jump': ..., 'max_files': ...})
+                      以 AnomalyRecorder 在背景存下異常取樣的 ROI (標上偵測框)
+    """
+    multi = isinstance(crop_xywh, dict)
+    names = list(crop_xywh) if multi else [None]
+    crops = [crop_xywh[name] for name in names] if multi else [crop_xywh]
+    # 只有一個 ROI 時，進度檔與異常存圖的檔名與原本相同
+    labels = names if len(crops) > 1 else [None]
+    callbacks = None
+    if on_measurement is not None:
+        callbacks = [(lambda row, name=name: on_measurement(name, row)) if multi else on_measurement
+                     for name in names]
+    logging.info(f"Starting video processing for file: {filepath}, ROIs: {crop_xywh}")
+    if len(crops) > 1 and (adaptive_sec is not None or shards > 1):
+        # 自適應取樣每個 ROI 的細分位置不同，無法合成同一批推論
+        logging.warning("Adaptive sampling and shards are not used when processing several ROIs")
+        adaptive_sec, shards = None, 1
+
+    if sample_interval_msec is not None:
+        # 時間取樣每一幀都要 seek，ffmpeg 每次都得重新啟動，不適用；也不切段
+        decoder, shards = 'opencv', 1
+
+    def done(results):
+        return dict(zip(names, results)) if multi else results[0]
+
+    cache_keys = None
+    if cache is not None:
+        cache_keys = [result_cache_key(cache, filepath, crop, modelpath, sample_step, sample_interval_msec,
+                                       gate_threshold, adaptive_sec, cascade_audit, decoder, shards)
+                      for crop in crops]
+        cached = [load_cached_result(cache, key, filepath) for key in cache_keys]
+        if all(measure_df is not None for measure_df in cached):
+            if callbacks is not None:
+                for callback, measure_df in zip(callbacks, cached):
+                    for row in measure_df.itertuples(index=False, name=None):
+                        callback(row)
+            return done(cached)
+
+    sharded = shards > 1
+    if model_local is None and not sharded:
+        # 共用同一個已 warm-up 的 session，不需每部影片重新建立
+        model_local = get_model(
+            modelpath,
+            confThreshold=CONF_THRESHOLD,
+            nmsThreshold=NMS_THRESHOLD
+        )
+
+    metrics = StageMetrics() if metrics_path is not None else NULL_METRICS
+    datas = [SampleBuffer() for _ in crops]
+    filename = os.path.basename(filepath)
+    date = video_start_time(filepath)
+    checkpoints = None
+    start_frame = 1
+    restored = [[] for _ in crops]
+    if checkpoint_path is not None:
+        checkpoints = [Checkpoint(checkpoint_path if label is None else roi_path(checkpoint_path, label),
+                                  checkpoint_header(filepath, crop, modelpath, sample_step, sample_interval_msec,
+                                                    gate_threshold, adaptive_sec, cascade_audit, decoder, shards),
+                                  checkpoint_interval) for label, crop in zip(labels, crops)]
+        restored = [checkpoint.load() for checkpoint in checkpoints]
+        # 各 ROI 的進度檔寫入時間不同，從進度最少的 ROI 繼續，其他 ROI 捨棄之後的部分
+        start_frame = min(rows[-1][0] + 1 if rows else 1 for rows in restored)
+        restored = [[row for row in rows if row[0] < start_frame] for rows in restored]
+        for checkpoint, rows, data in zip(checkpoints, restored, datas):
+            checkpoint.open(rows)
+            data.extend(rows)
+        if start_frame > 1:
+            logging.info(f"Resuming {filename} from checkpoint: {sum(map(len, restored))} samples, frame {start_frame}")
+
+    # 有 callback 時，邊處理邊切出測量結果，不必等整部影片處理完
+    segmenters = None
+    if callbacks is not None:
+        segmenters = [MeasurementSegmenter(callback, format_date=format_timestamp) for callback in callbacks]
+        for segmenter, rows in zip(segmenters, restored):
+            for row in rows:
+                segmenter.push(*row)
+
+    def emit(rows_by_roi):
+        for k, rows in enumerate(rows_by_roi):
+            for row in rows:
+                if segmenters is not None:
+                    segmenters[k].push(*row)
+                if checkpoints is not None:
+                    checkpoints[k].add(*row)
+
+    options = dict(batch_size=batch_size, sample_step=sample_step, sample_interval_msec=sample_interval_msec,
+                   pipeline_workers=pipeline_workers, queue_size=queue_size, gate_threshold=gate_threshold,
+                   adaptive_sec=adaptive_sec, cascade_audit=cascade_audit)
+    recorder = None
+    # 自適應取樣的推論順序與取樣順序不同，無法判斷讀值跳動，不存圖
+    if anomaly_options is not None and not sharded and adaptive_sec is None:
+        recorder = AnomalyRecorder(prefix=filename, **anomaly_options)
+    start = time.time()
+    try:
+        with profiling(profiler if metrics_path is not None else 'none', metrics_path):
+            if sharded:
+                # 長影片切成多段，各段在不同 process 處理後依序接回
+                from .video_shards import sample_in_shards
+                stats = sample_in_shards(filepath, crops[0], datas[0], lambda rows: emit([rows]), shards, start_frame,
+                                         options, decoder, modelpath, anomaly_options)
+            else:
+                # 各段在 worker 中各自開啟影片，只有不切段時才在這裡開啟
+                # ffmpeg 只輸出包含所有 ROI 的範圍，各 ROI 座標改成相對於該範圍
+                union = union_box(crops)
+                cap, frame_crop = open_capture(filepath, union, decoder, sample_step,
+                                               capture_ring_size(batch_size, queue_size, pipeline_workers))
+                offset_x, offset_y = union[0] - frame_crop[0], union[1] - frame_crop[1]
+                frame_crops = [[x - offset_x, y - offset_y, w, h] for x, y, w, h in crops]
+                try:
+                    stats = sample_video(cap, date, frame_crops, model_local, datas, emit, start_frame=start_frame,
+                                         metrics=metrics, recorder=recorder, names=labels, **options)
+                finally:
+                    cap.release()
+    except BaseException:
+        # 出錯時把已推論的部分寫進進度檔，下次從這裡繼續
+        if checkpoints is not None:
+            for checkpoint in checkpoints:
+                checkpoint.close()
+        raise
+    finally:
+        if recorder is not None:
+            recorder.close()
+    if recorder is not None:
+        stats.update(recorder.stats())
+    if segmenters is not None:
+        for segmenter in segmenters:
+            segmenter.finish()
+    end = time.time()
+
+    frame_log.flush()
+    sampled = sum(len(data) for data in datas)
+    metrics.count('frames_read', stats['frames_read'])
+    metrics.count('sampled_frames', sampled)
+    # 只在這裡計數 (shards 時模型在其他 process，detect_batch 中的計數不會回到這裡)
+    metrics.count('inferred_frames', stats['inferred'])
+    for key, value in stats.items():
+        if key.startswith(('gate_', 'cascade_', 'anomalies')):
+            metrics.count(key, value)
+    if 'gate_hits' in stats:
+        logging.info(f"Change gate stats: hits={stats['gate_hits']}, misses={stats['gate_misses']}")
+    if adaptive_sec is not None:
+        logging.info(f"Adaptive sampling: inferred {stats['inferred']} of {sampled} samples")
+    if 'cascade_hits' in stats:
+        audits = stats['cascade_audits']
+        agreement = stats['cascade_agreements'] / audits if audits else 1.0
+        logging.info(f"Cascade stats: template hits={stats['cascade_hits']}, model fallbacks={stats['cascade_fallbacks']}, "
+                     f"audits={audits}, audit agreement={agreement:.2%}")
+    logging.info(f"Video processing completed for file: {filepath}. ROIs: {len(crops)}, "
+                 f"Total frames: {stats['frames_read']}, Processing time: {end - start} seconds")
+
+    results = []
+    with metrics.timer('analyze'):
+        for k, data in enumerate(datas):
+            df = data.to_dataframe()
+            results.append(analyze_number_date(df))
+            if cache is not None:
+                cache.save_frames(cache_keys[k], df)
+                cache.save_measurements(cache_keys[k], ANALYSIS_VERSION, results[k])
+    if metrics_path is not None:
+        metrics.export(metrics_path)
+    if checkpoints is not None:
+        for checkpoint in checkpoints:
+            checkpoint.close(remove=True)
+    return done(results)
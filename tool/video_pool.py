@@ -0,0 +1,67 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .session_pool import get_model
+from .log_setup import setup_worker_logging, worker_log_queue
+from .anomaly_recorder import merge_indexes
+from .processing_options import video_kwargs
+from .utils import process_video, CONF_THRESHOLD, NMS_THRESHOLD
+
+# 每個 worker process 各自持有一個已載入的模型
+_worker_model = None
+
+def init_worker(modelpath, intra_op_num_threads, log_queue=None):
+    global _worker_model
+    # log 送回主 process 寫進同一個檔案 (多個 process 同時輪替同一個檔案會出錯)
+    setup_worker_logging(log_queue)
+    _worker_model = get_model(
+        modelpath,
+        confThreshold=CONF_THRESHOLD,
+        nmsThreshold=NMS_THRESHOLD,
+        intra_op_num_threads=intra_op_num_threads
+    )
+    logging.info(f"Worker {os.getpid()} ready, intra_op_num_threads={intra_op_num_threads}")
+
+def run_video(video_file, crop_xywh, options):
+    # crop_xywh 為 {名稱: [x, y, w, h]} 時一次讀多個 ROI，回傳 {名稱: measure_df}
+    measure_df = process_video(video_file, crop_xywh, model_local=_worker_model, **video_kwargs(options, video_file))
+    return video_file, measure_df
+
+def video_index_name(video_file):
+    """各部影片異常索引的檔名，處理完由主 process 併入 anomalies.csv"""
+    return f"anomalies_{os.path.basename(video_file)}.csv"
+
+def threads_per_worker(num_workers):
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+def process_videos_in_pool(video_files, crop_xywh, options):
+    """
+    options 為 processing_options 建立的處理選項，依 num_workers 同時處理多部影片 (不切段)
+    每處理完一部影片就 yield (video_file, measure_df)，順序依完成先後
+    crop_xywh 為 {名稱: [x, y, w, h]} 時，measure_df 為 {名稱: measure_df}
+    各 worker 的異常索引寫在各自的檔案，每部影片處理完就併入 anomalies.csv
+    """
+    num_workers = max(1, min(options['num_workers'], len(video_files)))
+    intra_op_num_threads = threads_per_worker(num_workers)
+    logging.info(f"Starting process pool: workers={num_workers}, intra_op_num_threads={intra_op_num_threads}")
+
+    anomaly_options = options['anomaly_options']
+    video_options = {video_file: dict(options, shards=1) for video_file in video_files}
+    if anomaly_options:
+        for video_file in video_files:
+            video_options[video_file]['anomaly_options'] = dict(anomaly_options, index_name=video_index_name(video_file))
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers,
+                                 initializer=init_worker,
+                                 initargs=(options['modelpath'], intra_op_num_threads, worker_log_queue())) as executor:
+            futures = [executor.submit(run_video, video_file, crop_xywh, video_options[video_file])
+                       for video_file in video_files]
+            for future in as_completed(futures):
+                video_file, measure_df = future.result()
+                if anomaly_options:
+                    merge_indexes(anomaly_options['out_dir'], [video_index_name(video_file)])
+                yield video_file, measure_df
+    finally:
+        # 中途出錯或停止時，已寫出的部分也併入
+        if anomaly_options:
+            merge_indexes(anomaly_options['out_dir'], [video_index_name(video_file) for video_file in video_files])
@@ -0,0 +1,102 @@
+import os
+import cv2
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from . import video_pool
+from .video_pool import init_worker, threads_per_worker
+from .log_setup import worker_log_queue
+from .sample_buffer import SampleBuffer, readings_to_float
+from .ffmpeg_capture import open_capture
+from .anomaly_recorder import AnomalyRecorder, merge_indexes, INDEX_NAME
+from .utils import sample_video, capture_ring_size, video_start_time, MODEL_PATH
+
+def shard_ranges(start_frame, total_frames, shards):
+    """把 [start_frame, total_frames] 切成 shards 段 (start, end)，最後一段 end 為 None，讀到影片結尾為止"""
+    remaining = total_frames - start_frame + 1
+    shards = max(1, min(shards, remaining))
+    bounds = [start_frame + remaining * i // shards for i in range(shards)] + [None]
+    return list(zip(bounds, bounds[1:]))
+
+def shard_index_name(filepath, start_frame):
+    """各段異常索引的檔名，處理完由主 process 併入整部影片的索引"""
+    return f"anomalies_{os.path.basename(filepath)}_{start_frame:08d}.csv"
+
+def split_max_files(max_files, shards):
+    """把 max_files 分給各段，總數不超過原本的上限"""
+    return [max_files * (i + 1) // shards - max_files * i // shards for i in range(shards)]
+
+def run_shard(filepath, crop_xywh, start_frame, end_frame, options, decoder='opencv', anomaly_options=None):
+    """
+    在 worker process 中處理一段，回傳 (frame, number, date) 三個陣列與統計
+    anomaly_options 由 sample_in_shards 給定該段的 max_files 與 index_name
+    """
+    date = video_start_time(filepath)
+    ring_size = capture_ring_size(options.get('batch_size', 8), options.get('queue_size', 64),
+                                  options.get('pipeline_workers', 2))
+    cap, frame_crop = open_capture(filepath, crop_xywh, decoder, options.get('sample_step', 3), ring_size)
+    data = SampleBuffer()
+    # 每段各自一個背景寫檔執行緒與索引檔，圖片檔名含幀編號，不會互相覆蓋
+    recorder = None
+    if anomaly_options and options.get('adaptive_sec') is None:
+        recorder = AnomalyRecorder(prefix=os.path.basename(filepath), **anomaly_options)
+    try:
+        stats = sample_video(cap, date, [frame_crop], video_pool._worker_model, [data],
+                             start_frame=start_frame, end_frame=end_frame, recorder=recorder, **options)
+    finally:
+        cap.release()
+        if recorder is not None:
+            recorder.close()
+    if recorder is not None:
+        stats.update(recorder.stats())
+    logging.info(f"Shard {start_frame}-{end_frame} of {filepath} done: {len(data)} samples")
+    return tuple(column.copy() for column in data.columns()), stats
+
+def sample_in_shards(filepath, crop_xywh, data, emit, shards, start_frame=1, options=None, decoder='opencv',
+                     modelpath=MODEL_PATH, anomaly_options=None):
+    """
+    依幀數把影片切成 shards 段，各段由不同 process seek 到起點後處理
+    結果依幀順序接回 data，並依序呼叫 emit(rows)；幀編號與時間都是以整部影片計算
+    每段的 ChangeGate / AdaptiveSampler 從頭開始：options 中 gate_threshold 為 None 且沒有 adaptive_sec 時，
+    接回後與依序處理相同；否則每段第一個取樣一定推論，讀值可能與依序處理 (沿用前一次預測) 不同
+    """
+    options = options or {}
+    cap = cv2.VideoCapture(filepath)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total_frames < start_frame:
+        # 無法得知總幀數 (或已處理完) 時不切段
+        logging.warning(f"Cannot shard {filepath}: frame count {total_frames}, processing in one process")
+        ranges = [(start_frame, None)]
+    else:
+        ranges = shard_ranges(start_frame, total_frames, shards)
+    logging.info(f"Processing {filepath} in {len(ranges)} shards: {ranges}")
+    shard_anomaly_options = [None] * len(ranges)
+    if anomaly_options:
+        max_files = split_max_files(anomaly_options.get('max_files', 500), len(ranges))
+        shard_anomaly_options = [dict(anomaly_options, max_files=max_files[i],
+                                      index_name=shard_index_name(filepath, start))
+                                 for i, (start, _) in enumerate(ranges)]
+
+    stats = {}
+    with ProcessPoolExecutor(max_workers=len(ranges),
+                             initializer=init_worker,
+                             initargs=(modelpath, threads_per_worker(len(ranges)), worker_log_queue())) as executor:
+        futures = [executor.submit(run_shard, filepath, crop_xywh, start, end, options, decoder, shard_options)
+                   for (start, end), shard_options in zip(ranges, shard_anomaly_options)]
+        try:
+            # 依起點順序取回結果，後面的段先做完也會等前面的段
+            for future in futures:
+                (frame, number, date), shard_stats = future.result()
+                data.extend_arrays(frame, number, date)
+                emit(list(zip(frame.tolist(), readings_to_float(number), date.tolist())))
+                for key, value in shard_stats.items():
+                    stats[key] = stats.get(key, 0) + value
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            if anomaly_options:
+                merge_indexes(anomaly_options['out_dir'],
+                              [shard_options['index_name'] for shard_options in shard_anomaly_options],
+                              anomaly_options.get('index_name', INDEX_NAME))
+    return stats
@@ -1,22 +1,140 @@
 import cv2
+import threading
 import numpy as np
 import onnxruntime as ort
+from .metrics import NULL_METRICS
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+# 原本先把 ROI 拉成 240x120 再 letterbox，不論框選的長寬比，模型看到的一律是 2:1 的畫面
+ROI_SIZE = (240, 120)
+ROI_ASPECT_HW = (1, 2)
+
+def letterbox_geometry(inpHeight, inpWidth, srch, srcw, keep_ratio=True):
+    """回傳 (newh, neww, top, left)，與 yolov6.resize_image 相同的計算方式"""
+    top, left, newh, neww = 0, 0, inpHeight, inpWidth
+    if keep_ratio and srch != srcw:
+        hw_scale = srch / srcw
+        if hw_scale > 1:
+            newh, neww = inpHeight, int(inpWidth / hw_scale)
+            left = int((inpWidth - neww) * 0.5)
+        else:
+            newh, neww = int(inpHeight * hw_scale), inpWidth
+            top = int((inpHeight - newh) * 0.5)
+    return newh, neww, top, left
+
+def roi_input_size(inpHeight, inpWidth, keep_ratio=True):
+    """2:1 的 ROI 在模型輸入中佔的 (width, height)；ROI 直接縮放成這個大小，letterbox 時只需複製"""
+    newh, neww, _, _ = letterbox_geometry(inpHeight, inpWidth, *ROI_ASPECT_HW, keep_ratio)
+    return neww, newh
+
+def resize_roi(roi, roi_size):
+    """
+    縮放成 roi_size (width, height)，回傳新的陣列，不會參照到整張畫面
+    與原本的兩次縮放相同：先以 INTER_LINEAR 拉成 240x120，letterbox 時再以 INTER_AREA 縮放，模型的輸入完全一致
+    """
+    roi = cv2.resize(roi, ROI_SIZE)
+    if tuple(roi_size) == ROI_SIZE:
+        return roi
+    return cv2.resize(roi, roi_size, interpolation=cv2.INTER_AREA)
+
+class LetterboxBuffer():
+    """
+    預先配置的前處理緩衝區：
+      canvas : 填好灰邊 (114) 的 uint8 影像，ROI 直接 resize 進中間區域
+      tensor : NCHW float32 輸入，canvas 正規化後直接寫入
+    letterbox 幾何只依 ROI 尺寸決定，計算一次後快取；已縮放成 roi_input_size 的 ROI 直接複製
+    """
+    def __init__(self, inpHeight, inpWidth, keep_ratio=True, max_batch=8):
+        self.inpHeight, self.inpWidth = inpHeight, inpWidth
+        self.keep_ratio = keep_ratio
+        self.canvas = np.full((inpHeight, inpWidth, 3), 114, dtype=np.uint8)
+        self.canvas_geometry = None
+        self.tensor = np.empty((max_batch, 3, inpHeight, inpWidth), dtype=np.float32)
+        self.geometries = {}
+
+    def geometry(self, srch, srcw):
+        key = (srch, srcw)
+        if key not in self.geometries:
+            self.geometries[key] = letterbox_geometry(self.inpHeight, self.inpWidth, srch, srcw, self.keep_ratio)
+        return self.geometries[key]
+
+    def reserve(self, batch):
+        if batch > self.tensor.shape[0]:
+            self.tensor = np.empty((batch, 3, self.inpHeight, self.inpWidth), dtype=np.float32)
+        return self.tensor[:batch]
+
+    def fill(self, index, srcimg):
+        newh, neww, top, left = geometry = self.geometry(srcimg.shape[0], srcimg.shape[1])
+        if self.canvas_geometry != geometry:
+            self.canvas[:] = 114
+            self.canvas_geometry = geometry
+        if srcimg.shape[:2] == (newh, neww):
+            # 前處理階段已縮放好 (prepare_frame)
+            self.canvas[top:top + newh, left:left + neww] = srcimg
+        else:
+            cv2.resize(srcimg, (neww, newh), dst=self.canvas[top:top + newh, left:left + neww],
+                       interpolation=cv2.INTER_AREA)
+        # BGR -> RGB、HWC -> CHW 都是 view，除以 255 時直接寫進 tensor
+        np.divide(self.canvas[:, :, ::-1].transpose(2, 0, 1), np.float32(255.0), out=self.tensor[index])
+        return newh, neww, top, left
 
 class yolov6():
-    def __init__(self, modelpath, confThreshold=0.5, nmsThreshold=0.5):
+    def __init__(self, modelpath, confThreshold=0.5, nmsThreshold=0.5, intra_op_num_threads=0,
+                 providers=('CPUExecutionProvider',), graph_optimization_level='all', execution_mode='sequential',
+                 input_size=320, annotate=False):
         # self.classes = list(map(lambda x:x.strip(), open('coco.names', 'r').readlines()))
         # self.num_classes = len(self.classes)
-        self.inpHeight, self.inpWidth = 320, 320
         so = ort.SessionOptions()
         so.log_severity_level = 3
-        
-        provider = ['CPUExecutionProvider']
+        # 0 代表由 onnxruntime 自行決定；多程序時需限制，避免 CPU 超額使用
+        so.intra_op_num_threads = intra_op_num_threads
+        so.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization_level]
+        so.execution_mode = EXECUTION_MODES[execution_mode]
+
+        provider = list(providers)
         # provider = ['CUDAExecutionProvider', 'CPUExecutionProvider']
-        
+
         self.net = ort.InferenceSession(modelpath, so, provider)
         self.confThreshold = confThreshold
         self.nmsThreshold = nmsThreshold
         self.keep_ratio=True
+        # 在原圖上畫出每個偵測框；處理影片時用不到畫好的圖，預設關閉
+        self.annotate = annotate
+        self.input_name = self.net.get_inputs()[0].name
+        # batch 維度為字串 (symbolic) 或 None 時，代表模型支援動態 batch
+        batch_dim, _, height_dim, width_dim = self.net.get_inputs()[0].shape
+        self.dynamic_batch = not isinstance(batch_dim, int)
+        # 輸入尺寸以模型為準 (縮小輸入的模型變體)；動態尺寸的模型才使用 input_size
+        self.inpHeight = height_dim if isinstance(height_dim, int) else input_size
+        self.inpWidth = width_dim if isinstance(width_dim, int) else input_size
+        # prepare_frame 把 ROI 縮放成這個大小 (width, height)
+        self.roi_size = roi_input_size(self.inpHeight, self.inpWidth, self.keep_ratio)
+        # 每個執行緒各自一份前處理緩衝區，同一個模型可被多執行緒共用
+        self._local = threading.local()
+
+    def letterbox_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = LetterboxBuffer(self.inpHeight, self.inpWidth, self.keep_ratio)
+            self._local.buffer = buffer
+        return buffer
+
+    def warmup(self, runs=1):
+        # 第一次 run 會做記憶體配置等初始化，先用空白輸入跑過
+        blob = np.zeros((1, 3, self.inpHeight, self.inpWidth), dtype=np.float32)
+        for _ in range(runs):
+            self.net.run(None, {self.input_name: blob})
 
     def resize_image(self, srcimg):
         top, left, newh, neww = 0, 0, self.inpWidth, self.inpHeight
@@ -47,51 +165,51 @@ class yolov6():
         frameHeight = frame.shape[0]
         frameWidth = frame.shape[1]
         newh, neww, padh, padw = padsize
-        ratioh, ratiow = frameHeight / newh, frameWidth / neww
+        # 門檻、padding 與比例都先轉成 float32，與模型輸出一起以 float32 計算：
+        # 不依賴 NumPy 的型別提升規則 (1.x 的 scalar 運算會升成 float64，2.x 依 NEP 50 維持 float32)，
+        # 結果與 NumPy 2 下逐筆計算的原本版本相同；改成 float64 會讓少數框差 1 pixel
+        ratioh, ratiow = np.float32(frameHeight / newh), np.float32(frameWidth / neww)
+        padh, padw = np.float32(padh), np.float32(padw)
+        conf_threshold = np.float32(self.confThreshold)
         # Scan through all the bounding boxes output from the network and keep only the
         # ones with high confidence scores. Assign the box's class label as the class with the highest score.
 
-        confidences = []
-        boxes = []
-        temp = []
-        classIds = []
-        for detection in outs:
-            if detection[4] > self.confThreshold:
-                scores = detection[5:]
-                classId = np.argmax(scores)
-                confidence = scores[classId] * detection[4]
-                if confidence > self.confThreshold:
-                    center_x = int((detection[0] - padw) * ratiow)
-                    center_y = int((detection[1] - padh) * ratioh)
-                    width = int(detection[2] * ratiow)
-                    height = int(detection[3] * ratioh)
-                    left = int(center_x - width * 0.5)
-                    top = int(center_y - height * 0.5)
-
-                    confidences.append(float(confidence))
-                    boxes.append([left, top, width, height])
-                    classIds.append(classId)
+        # 先用 objectness 過濾，再一次對整個 class 矩陣取 argmax
+        outs = np.asarray(outs, dtype=np.float32)
+        outs = outs[outs[:, 4] > conf_threshold]
+        classIds = np.argmax(outs[:, 5:], axis=1)
+        confidences = outs[np.arange(len(outs)), 5 + classIds] * outs[:, 4]
+        keep = confidences > conf_threshold
+        outs, classIds, confidences = outs[keep], classIds[keep], confidences[keep]
+
+        # int() 為向零取整，與 astype(np.int64) 相同
+        center_x = ((outs[:, 0] - padw) * ratiow).astype(np.int64)
+        center_y = ((outs[:, 1] - padh) * ratioh).astype(np.int64)
+        width = (outs[:, 2] * ratiow).astype(np.int64)
+        height = (outs[:, 3] * ratioh).astype(np.int64)
+        left = (center_x - width * 0.5).astype(np.int64)
+        top = (center_y - height * 0.5).astype(np.int64)
+        boxes = np.stack([left, top, width, height], axis=1)
+
         # Perform non maximum suppression to eliminate redundant overlapping boxes with
         # lower confidences.
         bbox = []
         if len(boxes) != 0:
-            indices = cv2.dnn.NMSBoxes(boxes, confidences, self.confThreshold, self.nmsThreshold)
-            indices = indices.flatten()
-            
+            indices = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), self.confThreshold, self.nmsThreshold)
+            indices = np.asarray(indices).flatten()
+
             for i in indices:
-                box = boxes[i]
-                left = box[0]
-                top = box[1]
-                width = box[2]
-                height = box[3]
-                conf = confidences[i]
+                left, top, width, height = boxes[i].tolist()
+                conf = float(confidences[i])
                 classid = classIds[i]
                 bbox.append( [left,top,width,height, conf, classid] )
-                frame = self.drawPred(frame, classIds[i], confidences[i], left, top, left + width, top + height)
+                if self.annotate:
+                    frame = self.drawPred(frame, classid, conf, left, top, left + width, top + height)
 
         return frame, bbox
 
-    def drawPred(self, frame, classId, conf, left, top, right, bottom):
+    @staticmethod
+    def drawPred(frame, classId, conf, left, top, right, bottom):
         # Draw a bounding box.
         cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), thickness=1)
 
@@ -111,11 +229,41 @@ class yolov6():
         # Sets the input to the network
         blob = np.expand_dims(np.transpose(img, (2, 0, 1)), axis=0)
 
-        outs = self.net.run(None, {self.net.get_inputs()[0].name: blob})[0].squeeze(axis=0)
+        outs = self.net.run(None, {self.input_name: blob})[0].squeeze(axis=0)
 
         srcimg = self.postprocess(srcimg, outs, padsize=(newh, neww, padh, padw))
         return srcimg
 
+    def detect_batch(self, srcimgs, metrics=NULL_METRICS):
+        # 將多張 crop 直接寫進預先配置的 NCHW tensor，只呼叫一次 session.run
+        if len(srcimgs) == 0:
+            return []
+        with metrics.timer('preprocess'):
+            buffer = self.letterbox_buffer()
+            blob = buffer.reserve(len(srcimgs))
+            padsizes = [buffer.fill(i, srcimg) for i, srcimg in enumerate(srcimgs)]
+
+        with metrics.timer('session_run'):
+            if self.dynamic_batch:
+                outs = self.net.run(None, {self.input_name: blob})[0]
+            else:
+                # 模型的 batch 維度固定為 1 時，退回逐張推論
+                outs = np.concatenate([self.net.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                       for i in range(blob.shape[0])], axis=0)
+
+        results = []
+        with metrics.timer('postprocess'):
+            for srcimg, out, padsize in zip(srcimgs, outs, padsizes):
+                _, bbox = self.postprocess(srcimg, out, padsize=padsize)
+                results.append(bbox)
+        return results
+
+def draw_detections(frame, bbox):
+    """在 frame 上畫出 bbox ([left, top, width, height, conf, classid], ...)，用於除錯輸出"""
+    for left, top, width, height, conf, classid in bbox:
+        frame = yolov6.drawPred(frame, classid, conf, int(left), int(top), int(left + width), int(top + height))
+    return frame
+
 # if __name__ == "__main__":
 #     parser = argparse.ArgumentParser()
 #     parser.add_argument('--imgpath', type=str, default='3.jpg', help="image path")
@@ -124,7 +272,7 @@ class yolov6():
 #     parser.add_argument('--nmsThreshold', default=0.5, type=float, help='nms iou thresh')
 #     args = parser.parse_args()
 
-#     yolonet = yolov6(args.modelpath, confThreshold=args.confThreshold, nmsThreshold=args.nmsThreshold)
+#     yolonet = yolov6(args.modelpath, confThreshold=args.confThreshold, nmsThreshold=args.nmsThreshold, annotate=True)
 #     srcimg = cv2.imread(args.imgpath)
 #     srcimg,bbox = yolonet.detect(srcimg)
 
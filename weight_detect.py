@@ -1,45 +1,99 @@
 import sys
-import pandas as pd
+import time
+import multiprocessing
+
+# 啟動時間從這裡開始計算 (模組載入到視窗 / CLI 可開始處理)
+STARTUP_BEGIN = time.perf_counter()
+
+if __name__ == "__main__":
+    # PyInstaller 打包後使用多程序需要 freeze_support，放在載入 PyQt 之前，worker 才不會多載入 GUI 套件
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "cli":
+        # 無介面批次模式：不載入 PyQt6
+        from tool.cli import main
+        sys.exit(main(sys.argv[2:], startup_begin=STARTUP_BEGIN))
+
 import os
-import cv2
-import onnxruntime as ort
 import logging
+from functools import partial
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QFileDialog, QLabel, QListWidget, QProgressBar, QAbstractItemView,
-    QDialog, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QMessageBox
+    QDialog, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QGraphicsSimpleTextItem, QMessageBox,
+    QInputDialog
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QImage, QPixmap, QPen, QColor
 import configparser
-# 假設 process_video 函數在 tool.utils 模組中
-from tool.utils import process_video
+from tool.log_setup import setup_logging
+from tool.rois import (rois_from_config, rois_to_config, result_csv_name, check_roi_name, read_crop_section,
+                       MAIN_ROI)
+# pandas / cv2 / onnxruntime / tool.utils 較慢，在用到時才載入
 
 # Setup logging
-logging.basicConfig(filename='process.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+setup_logging()
 
 class VideoProcessingWorker(QThread):
-    progress_update = pyqtSignal(int, str, str, pd.DataFrame)
+    progress_update = pyqtSignal(int, str, str, object)  # object: pandas.DataFrame
 
-    def __init__(self, video_files, crop_img):
+    def __init__(self, video_files, crop_img, options):
         super().__init__()
         self.video_files = video_files
-        self.crop_img = crop_img  # [X, Y, W, H]
+        self.crop_img = crop_img  # [X, Y, W, H]，多個 ROI 時為 {名稱: [X, Y, W, H]}
+        self.options = options  # processing_options 建立的處理選項
 
     def run(self):
+        # 不論依序處理或多程序，每部影片的結果都是 measure_df，多個 ROI 時為 {名稱: measure_df}
+        if self.options['num_workers'] > 1 and len(self.video_files) > 1:
+            results = self.process_in_pool()
+        else:
+            results = self.process_in_order()
+
+        total_videos = len(self.video_files)
+        for i, (video_file, result) in enumerate(results):
+            logging.info(f"Processed video: {os.path.basename(video_file)}")
+            # 發送進度更新信號，包含 measure_df
+            progress = int(((i + 1) / total_videos) * 100)
+            tables = result if isinstance(result, dict) else {None: result}
+            for name, measure_df in tables.items():
+                self.progress_update.emit(progress, video_file, self.csv_file(video_file, name), measure_df)
+
+    @staticmethod
+    def csv_file(video_file, name=None):
+        return os.path.join(".", result_csv_name(os.path.basename(video_file), name))
+
+    def process_in_order(self):
+        import pandas as pd
+        from tool.utils import process_video
+        from tool.processing_options import video_kwargs
+
+        # 一次處理一部影片 (可切段)，每部影片完成就 yield (video_file, result)
+        multi = isinstance(self.crop_img, dict)
         total_videos = len(self.video_files)
         for i, video_file in enumerate(self.video_files):
-            filename = os.path.basename(video_file)
-            logging.info(f"Processing video: {filename}")
+            logging.info(f"Processing video: {os.path.basename(video_file)}")
             logging.info(f"Crop coordinates: {self.crop_img}")
-            
-            # 呼叫處理影片的函數，並傳入 crop_img
-            measure_df = process_video(video_file, self.crop_img)
-            csv_file = os.path.join(".", f"{filename}_result.csv")
 
-            # 發送進度更新信號，包含 measure_df
-            progress = int(((i + 1) / total_videos) * 100)
-            self.progress_update.emit(progress, video_file, csv_file, measure_df)
+            # 每切出一筆測量結果就先送到 GUI
+            partial_rows = {}
+            def on_measurement(name, row, i=i, video_file=video_file, partial_rows=partial_rows):
+                rows = partial_rows.setdefault(name, [])
+                rows.append(row)
+                partial_df = pd.DataFrame(rows, columns=["測量", "數值", "時間"])
+                self.progress_update.emit(int((i / total_videos) * 100), video_file,
+                                          self.csv_file(video_file, name), partial_df)
+
+            result = process_video(video_file, self.crop_img,
+                                   on_measurement=on_measurement if multi else partial(on_measurement, None),
+                                   **video_kwargs(self.options, video_file))
+            yield video_file, result
+
+    def process_in_pool(self):
+        from tool.video_pool import process_videos_in_pool
+
+        # 多程序模式：影片分散到多個 worker，依完成先後 yield
+        logging.info(f"Crop coordinates: {self.crop_img}")
+        return process_videos_in_pool(self.video_files, self.crop_img, self.options)
 
 class VideoProcessingApp(QWidget):
     def __init__(self):
@@ -121,6 +175,10 @@ class VideoProcessingApp(QWidget):
 
         self.layout.addLayout(self.crop_layout)
 
+        # 有其他 ROI 時列出名稱
+        self.roi_label = QLabel("")
+        self.layout.addWidget(self.roi_label)
+
         # 處理進度條
         self.progress_bar = QProgressBar()
         self.progress_bar.setValue(0)
@@ -157,11 +215,16 @@ class VideoProcessingApp(QWidget):
         self.config = configparser.ConfigParser()
         self.load_config()
 
-        # 初始框選範圍
-        self.crop_img = [self.config.getint('CROP', 'X'),
-                         self.config.getint('CROP', 'Y'),
-                         self.config.getint('CROP', 'W'),
-                         self.config.getint('CROP', 'H')]
+        # 初始框選範圍：[CROP] 為主要範圍，[CROP:名稱] 為其他範圍
+        try:
+            self.rois = rois_from_config(self.config)
+        except ValueError as e:
+            # 範圍名稱會成為檔名的一部分，不合法時只使用 [CROP]
+            logging.error(f"{e}, using [CROP] only")
+            QMessageBox.warning(self, "警告", f"settings.ini 中的範圍名稱不合法，只使用 [CROP]。\n{e}")
+            self.rois = {MAIN_ROI: read_crop_section(self.config, 'CROP')}
+        self.crop_img = next(iter(self.rois.values()))
+        self.update_crop_labels()
 
         # 其餘代碼...
     
@@ -172,6 +235,15 @@ class VideoProcessingApp(QWidget):
         else:
             # 如果配置文件不存在，則使用默認值並創建配置文件
             self.config['CROP'] = {'X': '880', 'Y': '240', 'W': '120', 'H': '60'}
+            self.config['MODEL'] = {'PATH': './onnx_model/yolov6s.onnx'}
+            self.config['PROCESS'] = {'WORKERS': '1', 'SHARDS': '1', 'ADAPTIVE_SEC': '0', 'DECODER': 'opencv',
+                                      'GATE_THRESHOLD': '20'}
+            self.config['METRICS'] = {'ENABLED': '0', 'PROFILER': 'none'}
+            self.config['CACHE'] = {'ENABLED': '1', 'DIR': './cache', 'MAX_MB': '1024'}
+            self.config['CHECKPOINT'] = {'ENABLED': '1', 'INTERVAL_SEC': '60'}
+            self.config['CASCADE'] = {'ENABLED': '0', 'AUDIT': '0.02'}
+            self.config['ANOMALY'] = {'ENABLED': '0', 'DIR': './anomalies', 'LOW_CONF': '0.8', 'MAX_JUMP': '50',
+                                      'MAX_FILES': '500'}
             with open(config_file, 'w') as configfile:
                 self.config.write(configfile)
 
@@ -181,17 +253,17 @@ class VideoProcessingApp(QWidget):
         self.crop_y_value.setText(str(self.crop_img[1]))
         self.crop_w_value.setText(str(self.crop_img[2]))
         self.crop_h_value.setText(str(self.crop_img[3]))
+        names = list(self.rois)
+        self.roi_label.setText(f"框選範圍: {', '.join(names)}" if len(names) > 1 else "")
 
-    def update_crop_values(self, x, y, w, h):
-        self.crop_img = [x, y, w, h]
-        logging.info(f"Updating crop values to: {self.crop_img}")
+    def update_crop_values(self, rois):
+        self.rois = rois
+        self.crop_img = next(iter(rois.values()))
+        logging.info(f"Updating crop values to: {self.rois}")
         self.update_crop_labels()
 
         # 更新配置文件
-        self.config['CROP']['X'] = str(x)
-        self.config['CROP']['Y'] = str(y)
-        self.config['CROP']['W'] = str(w)
-        self.config['CROP']['H'] = str(h)
+        rois_to_config(self.config, rois)
         with open("settings.ini", 'w') as configfile:
             self.config.write(configfile)
 
@@ -213,6 +285,7 @@ class VideoProcessingApp(QWidget):
                 QMessageBox.warning(self, "載入失敗", "無法讀取第一個影片的第一幀。")
 
     def load_first_frame(self, video_path):
+        import cv2
         cap = cv2.VideoCapture(video_path)
         ret, frame = cap.read()
         cap.release()
@@ -241,7 +314,7 @@ class VideoProcessingApp(QWidget):
             QMessageBox.warning(self, "警告", "無法載入影片的第一幀。")
             return
 
-        dialog = ImageCropperDialog(self.first_frame, self.crop_img, self)
+        dialog = ImageCropperDialog(self.first_frame, self.rois, self)
         dialog.crop_selected.connect(self.update_crop_values)
         
         dialog.exec()
@@ -256,15 +329,21 @@ class VideoProcessingApp(QWidget):
         self.processed_files.clear()
         self.measured_dfs.clear()
 
-        self.worker = VideoProcessingWorker([item.text() for item in selected_items], self.crop_img)
+        from tool.processing_options import processing_options_from_config
+        options = processing_options_from_config(self.config)
+        # 只有一個 ROI 時與原本相同；多個 ROI 時傳入 {名稱: [X, Y, W, H]}
+        crop = self.crop_img if len(self.rois) == 1 else dict(self.rois)
+        self.worker = VideoProcessingWorker([item.text() for item in selected_items], crop, options)
         self.worker.progress_update.connect(self.update_progress)
         self.worker.finished.connect(self.on_processing_finished)
         self.worker.start()
 
     def update_progress(self, progress, video_file, csv_file, measure_df):
         logging.info(f"Video processing progress: {progress}% for file: {video_file}")
-        self.csv_list.addItem(csv_file)
-        self.processed_files.append(csv_file)
+        # 同一部影片會先收到部分結果，之後再收到完整結果
+        if csv_file not in self.measured_dfs:
+            self.csv_list.addItem(csv_file)
+            self.processed_files.append(csv_file)
         self.measured_dfs[csv_file] = measure_df
         self.progress_bar.setValue(progress)
 
@@ -290,6 +369,7 @@ class VideoProcessingApp(QWidget):
             self.label.setText(f"CSV 檔案已下載到 {save_directory}")
 
     def check_gpu_status(self):
+        import onnxruntime as ort
         device = ort.get_device()
         logging.info(f"Detected device: {device}")
         if device == "GPU":
@@ -384,16 +464,19 @@ class ResizableRectItem(QGraphicsRectItem):
         super().mouseReleaseEvent(event)
 
 class ImageCropperDialog(QDialog):
-    crop_selected = pyqtSignal(int, int, int, int)  # X, Y, W, H
+    crop_selected = pyqtSignal(object)  # {名稱: [X, Y, W, H]}，第一個為主要範圍
+
+    # 各範圍的框線顏色，依順序循環使用
+    ROI_COLORS = [(255, 0, 0), (0, 160, 255), (0, 200, 0), (255, 160, 0), (200, 0, 200)]
 
-    def __init__(self, image, initial_crop, parent=None):
+    def __init__(self, image, initial_rois, parent=None):
         super().__init__(parent)
         self.setWindowTitle("調整框選範圍")
         self.setGeometry(150, 150, 1920, 1080)
 
         self.image = image
         self.ori_img_h, self.ori_img_w, self.ori_img_c = image.shape
-        self.initial_crop = initial_crop  # [X, Y, W, H]
+        self.initial_rois = dict(initial_rois)  # {名稱: [X, Y, W, H]}
 
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
@@ -408,12 +491,20 @@ class ImageCropperDialog(QDialog):
         self.qimage = self.convert_cv_qt(self.image)
         self.pixmap_item = self.scene.addPixmap(QPixmap.fromImage(self.qimage))
 
-        # 添加可調整的矩形框
-        x, y, w, h = self.initial_crop
-        self.rect_item = ResizableRectItem(x, y, w, h, self.ori_img_h, self.ori_img_w)  # 使用新的 ResizableRectItem
-        self.rect_item.setPen(QPen(QColor(255, 0, 0), 2))   # 紅色邊框
-        self.rect_item.setBrush(QColor(255, 0, 0, 100))     # 可視化填充
-        self.scene.addItem(self.rect_item)
+        # 每個範圍一個可調整的矩形框，左上角標示名稱
+        self.rect_items = {}
+        for name, crop in self.initial_rois.items():
+            self.add_rect(name, crop)
+
+        # 新增 / 刪除範圍
+        self.roi_button_layout = QHBoxLayout()
+        self.add_button = QPushButton("新增範圍")
+        self.add_button.clicked.connect(self.add_roi)
+        self.remove_button = QPushButton("刪除選取的範圍")
+        self.remove_button.clicked.connect(self.remove_selected_rois)
+        self.roi_button_layout.addWidget(self.add_button)
+        self.roi_button_layout.addWidget(self.remove_button)
+        self.layout.addLayout(self.roi_button_layout)
 
         # 確認和取消按鈕
         self.button_layout = QHBoxLayout()
@@ -425,7 +516,55 @@ class ImageCropperDialog(QDialog):
         self.button_layout.addWidget(self.cancel_button)
         self.layout.addLayout(self.button_layout)
 
+    def add_rect(self, name, crop):
+        x, y, w, h = crop
+        r, g, b = self.ROI_COLORS[len(self.rect_items) % len(self.ROI_COLORS)]
+        rect_item = ResizableRectItem(x, y, w, h, self.ori_img_h, self.ori_img_w)  # 使用新的 ResizableRectItem
+        rect_item.setPen(QPen(QColor(r, g, b), 2))
+        rect_item.setBrush(QColor(r, g, b, 100))     # 可視化填充
+        # 名稱為矩形框的子項目，拖曳時一起移動
+        label = QGraphicsSimpleTextItem(name, rect_item)
+        label.setBrush(QColor(r, g, b))
+        label.setPos(x, max(0, y - 20))
+        self.scene.addItem(rect_item)
+        self.rect_items[name] = rect_item
+
+    def add_roi(self):
+        name, ok = QInputDialog.getText(self, "新增範圍", "範圍名稱 (例如 tare)：")
+        name = name.strip()
+        if not ok or not name:
+            return
+        try:
+            check_roi_name(name)
+        except ValueError:
+            QMessageBox.warning(self, "警告", f"範圍名稱「{name}」不合法，只能使用文字、數字、_、- 與 .。")
+            return
+        if name in self.rect_items:
+            QMessageBox.warning(self, "警告", f"範圍名稱「{name}」已存在。")
+            return
+        # 新範圍與主要範圍同樣大小，放在它的右邊
+        x, y, w, h = self.crop_of(next(iter(self.rect_items.values())))
+        x = min(x + w + 10, max(0, self.ori_img_w - w))
+        self.add_rect(name, [x, y, w, h])
+        logging.info(f"ROI added: {name}")
+
+    def remove_selected_rois(self):
+        main_name = next(iter(self.rect_items))
+        for name, rect_item in list(self.rect_items.items()):
+            # 主要範圍 ([CROP]) 不能刪除
+            if rect_item.isSelected() and name != main_name:
+                self.scene.removeItem(rect_item)
+                del self.rect_items[name]
+                logging.info(f"ROI removed: {name}")
+
+    def crop_of(self, rect_item):
+        rect = rect_item.rect()
+        scene_position = rect_item.scenePos()
+        return [int(scene_position.x() + rect.x()), int(scene_position.y() + rect.y()),
+                int(rect.width()), int(rect.height())]
+
     def convert_cv_qt(self, cv_img):
+        import cv2
         rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
         height, width, channel = rgb_image.shape
         bytes_per_line = 3 * width
@@ -433,22 +572,16 @@ class ImageCropperDialog(QDialog):
         return q_image
 
     def accept(self):
-        # 獲取矩形框的位置和大小
-        rect = self.rect_item.rect()
-        scene_position = self.rect_item.scenePos()
-        
-        x = int(scene_position.x() + rect.x())
-        y = int(scene_position.y() + rect.y())
-        w = int(rect.width())
-        h = int(rect.height())
-        
-        logging.info(f"Crop confirmed: x={x}, y={y}, w={w}, h={h}")
-        
-        self.crop_selected.emit(x, y, w, h)
+        # 獲取各矩形框的位置和大小
+        rois = {name: self.crop_of(rect_item) for name, rect_item in self.rect_items.items()}
+        logging.info(f"Crop confirmed: {rois}")
+
+        self.crop_selected.emit(rois)
         super().accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = VideoProcessingApp()
     window.show()
+    logging.info(f"Startup time: {time.perf_counter() - STARTUP_BEGIN:.3f} seconds")
     sys.exit(app.exec())